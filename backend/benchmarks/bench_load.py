@@ -0,0 +1,172 @@
+"""Gerador de carga SSE concorrente para ``/api/chat``.
+
+Mede, por requisição, o time-to-first-token (TTFT), a duração total e a taxa
+de tokens, e reporta p50/p95/p99 e o número máximo de streams simultâneos
+sustentados por worker.
+
+Contra um backend já em execução:
+
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000 --concurrency 50 --requests 200
+
+(suba esse backend com ``CACHE_RESPONSE_TTL=0``; senão as requisições
+repetidas são respondidas pelo cache de respostas).
+
+Ou subindo upstreams simulados + backend automaticamente (sem rede):
+
+    python -m benchmarks.bench_load --spawn --workers 1 --concurrency 50 --requests 200
+"""
+from typing import List, Dict, Any, Optional
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from .fake_upstreams import FakeUpstreamConfig
+from .harness import backend_server, fake_upstreams, summarize
+
+# Mensagem longa o suficiente para seguir pela chain terapêutica (com recuperação)
+DEFAULT_MESSAGE = (
+    "Tenho sonhado repetidamente com uma casa escura e sinto que existe algo "
+    "em mim que evito olhar. Como a psicologia junguiana entende isso?"
+)
+
+class LoadStats:
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.ttft: List[float] = []
+        self.duration: List[float] = []
+        self.tokens_per_s: List[float] = []
+        self.tokens = 0
+        self.events = 0
+        self.errors = 0
+
+async def one_stream(client: httpx.AsyncClient, url: str, message: str, stats: LoadStats) -> None:
+    start = time.perf_counter()
+    first_token_at: Optional[float] = None
+    tokens = 0
+    stats.active += 1
+    stats.max_active = max(stats.max_active, stats.active)
+    try:
+        async with client.stream(
+            "POST",
+            f"{url}/api/chat",
+            json={"message": message, "conversationId": None, "user_id": "bench"},
+            headers={"Authorization": "Bearer bench"},
+        ) as response:
+            if response.status_code != 200:
+                stats.errors += 1
+                return
+            event = "message"
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    if event == "error":
+                        stats.errors += 1
+                    elif event == "message":
+                        payload = json.loads(line[5:])
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        # Os tokens simulados são palavras seguidas de espaço
+                        tokens += max(payload.get("text", "").count(" "), 1)
+                        stats.events += 1
+                elif not line:
+                    event = "message"
+    except httpx.HTTPError:
+        stats.errors += 1
+        return
+    finally:
+        stats.active -= 1
+
+    end = time.perf_counter()
+    if first_token_at is None:
+        stats.errors += 1
+        return
+    stats.ttft.append(first_token_at - start)
+    stats.duration.append(end - start)
+    stats.tokens += tokens
+    if end > first_token_at:
+        stats.tokens_per_s.append(tokens / (end - first_token_at))
+
+async def run_load(url: str, concurrency: int, requests: int, message: str = DEFAULT_MESSAGE) -> Dict[str, Any]:
+    stats = LoadStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300.0), limits=limits) as client:
+        async def worker():
+            async with semaphore:
+                await one_stream(client, url, message, stats)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    ttft = summarize(stats.ttft)
+    duration = summarize(stats.duration)
+    rate = summarize(stats.tokens_per_s)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": stats.errors,
+        "requests_per_s": len(stats.duration) / elapsed,
+        "ttft_p50_s": ttft["p50"],
+        "ttft_p95_s": ttft["p95"],
+        "ttft_p99_s": ttft["p99"],
+        "duration_p50_s": duration["p50"],
+        "duration_p95_s": duration["p95"],
+        "duration_p99_s": duration["p99"],
+        "tokens_per_s": rate["p50"],
+        "events_per_stream": stats.events / max(len(stats.duration), 1),
+        "max_concurrent_streams": stats.max_active,
+    }
+
+def run_spawned(
+    concurrency: int,
+    requests: int,
+    workers: int = 1,
+    config: Optional[FakeUpstreamConfig] = None,
+    extra_env: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """Executa a carga contra um backend local apontado para upstreams simulados.
+
+    O cache de respostas fica desligado (``CACHE_RESPONSE_TTL=0``): a mesma
+    mensagem repetida viraria replay do cache e o teste não mediria o streaming.
+    """
+    env = {"CACHE_RESPONSE_TTL": "0", **(extra_env or {})}
+    with fake_upstreams(config) as upstream_url:
+        with backend_server(upstream_url, workers=workers, extra_env=env) as url:
+            result = asyncio.run(run_load(url, concurrency, requests))
+    result["workers"] = workers
+    result["max_concurrent_streams_per_worker"] = result["max_concurrent_streams"] / workers
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL de um backend já em execução")
+    parser.add_argument("--spawn", action="store_true", help="Sobe upstreams simulados e o backend localmente")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--message", default=DEFAULT_MESSAGE)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.spawn:
+        config = FakeUpstreamConfig(
+            ttft_ms=args.ttft_ms,
+            tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens,
+        )
+        result = run_spawned(args.concurrency, args.requests, args.workers, config)
+    elif args.url:
+        result = asyncio.run(run_load(args.url, args.concurrency, args.requests, args.message))
+    else:
+        parser.error("Informe --url ou --spawn")
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
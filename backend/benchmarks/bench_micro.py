@@ -0,0 +1,78 @@
+"""Microbenchmarks de chunking, extração de metadados e recuperação (sem rede).
+
+A recuperação usa o ``JungianVectorStore`` real contra os upstreams simulados,
+medindo o caminho completo embedding -> query -> content store.
+
+Uso (a partir de backend/): ``python -m benchmarks.bench_micro``
+"""
+from typing import Dict
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from .fake_upstreams import FakeUpstreamConfig, fake_upstream_env
+from .harness import fake_upstreams, synthetic_book, time_call
+
+def bench_chunking(book: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    from knowledge_system.chunking import JungianTextProcessor
+    processor = JungianTextProcessor()
+    section = book[:20_000]
+    results = {
+        "chunking.process_text_book": time_call(lambda: processor.process_text(book), repeat=max(repeat // 5, 3), warmup=1),
+        "chunking.process_text_section": time_call(lambda: processor.process_text(section), repeat=repeat),
+        "chunking.extract_metadata_book": time_call(lambda: processor.extract_metadata(book), repeat=repeat),
+    }
+    chunks = processor.text_splitter.split_text(section)
+    results["chunking.extract_metadata_chunk"] = time_call(
+        lambda: [processor.extract_metadata(chunk) for chunk in chunks], repeat=repeat
+    )
+    results["chunking.process_text_book"]["chars_per_s"] = len(book) * results["chunking.process_text_book"]["ops_per_s"]
+    return results
+
+def bench_retrieval(repeat: int) -> Dict[str, Dict[str, float]]:
+    config = FakeUpstreamConfig(embedding_latency_ms=0, query_latency_ms=0)
+    with fake_upstreams(config) as base_url:
+        os.environ.update(fake_upstream_env(base_url))
+        from knowledge_system.content_store import JungianContentStore
+        from knowledge_system.vector_store import JungianVectorStore
+
+        store = JungianVectorStore(
+            api_key=os.environ["PINECONE_API_KEY"],
+            environment="local",
+            content_store=JungianContentStore(os.path.join(tempfile.mkdtemp(), "content.sqlite3")),
+        )
+        queries = iter(f"Como integrar a sombra {i}?" for i in range(100_000))
+        batch = lambda size: [next(queries) for _ in range(size)]
+
+        async def search_many(items):
+            return [result async for result in store.similarity_search_many(items, k=3)]
+
+        # Um único event loop: o cliente assíncrono da OpenAI fica preso ao loop em que foi usado
+        loop = asyncio.new_event_loop()
+        try:
+            return {
+                "retrieval.similarity_search": time_call(
+                    lambda: loop.run_until_complete(store.similarity_search(next(queries), k=3)), repeat=repeat
+                ),
+                "retrieval.similarity_search_many_50": time_call(
+                    lambda: loop.run_until_complete(search_many(batch(50))), repeat=max(repeat // 4, 3)
+                ),
+            }
+        finally:
+            loop.close()
+
+def run(repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    book = synthetic_book()
+    results = bench_chunking(book, repeat)
+    results.update(bench_retrieval(repeat))
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
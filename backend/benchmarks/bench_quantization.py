@@ -0,0 +1,94 @@
+"""Benchmark de recall@k do índice quantizado contra a busca exata em float32.
+
+Uso (a partir de backend/):
+
+    python -m benchmarks.bench_quantization --n 20000 --k 10
+    python -m benchmarks.bench_quantization --vectors embeddings.npy
+
+Sem ``--vectors``, gera embeddings sintéticos com espectro decrescente
+(anisotrópicos, como os da OpenAI). Não faz chamadas de rede.
+
+Como em produção, os índices comprimidos guardam os vetores de rescoring em
+disco (memmap num diretório temporário); ``bytes/vetor`` conta só o que fica
+em RAM. A configuração exata mantém os vetores em float32 na RAM.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from knowledge_system.quantization import QuantizedVectorIndex, _normalize
+
+CONFIGS = [
+    ("float32 (exato)", dict(quantization=None)),
+    ("int8", dict(quantization="int8")),
+    ("pq m=192", dict(quantization="pq", pq_subspaces=192)),
+    ("pq m=96", dict(quantization="pq", pq_subspaces=96)),
+    ("matryoshka 512 + int8", dict(reduction="matryoshka", dimensions=512, quantization="int8")),
+    ("pca 256 + int8", dict(reduction="pca", dimensions=256, quantization="int8")),
+    ("pca 256 + pq m=32", dict(reduction="pca", dimensions=256, quantization="pq", pq_subspaces=32)),
+]
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(np.arange(1, dim + 1))
+    centers = rng.standard_normal((clusters, dim)) * spectrum
+    assignment = rng.integers(0, clusters, size=n)
+    noise = rng.standard_normal((n, dim)) * spectrum * 0.6
+    return _normalize((centers[assignment] + noise).astype(np.float32))
+
+def recall_at_k(truth: np.ndarray, found: list) -> float:
+    return len(set(truth) & set(found)) / len(truth)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", help="Arquivo .npy com embeddings reais (n x dim)")
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.vectors:
+        base = _normalize(np.load(args.vectors).astype(np.float32))
+    else:
+        base = synthetic_embeddings(args.n, args.dim, args.clusters)
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(base), size=args.queries, replace=False)
+    queries = _normalize(base[picks] + rng.standard_normal(base[picks].shape).astype(np.float32) * 0.02)
+    ids = [str(i) for i in range(len(base))]
+
+    exact = np.argsort(-(queries @ base.T), axis=1)[:, :args.k]
+    truth = [[ids[i] for i in row] for row in exact]
+
+    full_bytes = base.shape[1] * 4
+    print(f"{len(base)} vetores x {base.shape[1]} dims, {args.queries} consultas, k={args.k}")
+    print(f"{'configuração':<24}{'bytes/vetor':>12}{'redução':>9}{'recall':>9}{'+rescore':>10}{'ms/consulta':>13}")
+
+    with tempfile.TemporaryDirectory(prefix="bench_quantization_") as directory:
+        for position, (name, config) in enumerate(CONFIGS):
+            index = QuantizedVectorIndex(rescore_factor=args.rescore_factor, **config)
+            if not index.exact:
+                index.path = os.path.join(directory, str(position))
+            index.train(base)
+            index.add(ids, base)
+            bytes_per_vector = index.memory_bytes() / len(index)
+
+            results = {}
+            for rescore in (False, True):
+                start = time.perf_counter()
+                found = [[i for i, _ in index.search(q, k=args.k, rescore=rescore)] for q in queries]
+                elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+                recall = np.mean([recall_at_k(t, f) for t, f in zip(truth, found)])
+                results[rescore] = (recall, elapsed)
+
+            print(
+                f"{name:<24}{bytes_per_vector:>12.0f}{full_bytes / bytes_per_vector:>8.1f}x"
+                f"{results[False][0]:>9.3f}{results[True][0]:>10.3f}{results[True][1]:>13.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
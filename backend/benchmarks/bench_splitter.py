@@ -0,0 +1,71 @@
+"""Throughput e uniformidade dos chunks: JungianTextSplitter vs RecursiveCharacterTextSplitter.
+
+Compara três variantes no mesmo livro sintético:
+
+- ``recursive_chars``: o splitter anterior (1000/200 caracteres);
+- ``recursive_tokens``: o RecursiveCharacterTextSplitter medindo tokens do tiktoken
+  (o equivalente direto, com a mesma hierarquia de separadores);
+- ``jungian_tokens`` / ``jungian_stream``: o splitter em passada única, em
+  memória e a partir de um stream de blocos de 64 KB.
+
+Além da latência, reporta a distribuição de tokens por chunk.
+
+Uso (a partir de backend/): ``python -m benchmarks.bench_splitter``
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import statistics
+from .harness import synthetic_book, time_call
+
+SEPARATORS = ["\n## ", "\n### ", "\n\n", "\n", ". ", " ", ""]
+
+def _token_stats(splitter, chunks: List[str]) -> Dict[str, float]:
+    counts = [splitter.count_tokens(chunk) for chunk in chunks]
+    return {
+        "chunks": len(counts),
+        "tokens_mean": statistics.mean(counts),
+        "tokens_stdev": statistics.pstdev(counts),
+        "tokens_min": min(counts),
+        "tokens_max": max(counts),
+    }
+
+def run(repeat: int = 10, copies: int = 1) -> Dict[str, Dict[str, float]]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from knowledge_system.text_splitter import JungianTextSplitter
+
+    book = synthetic_book() * copies
+    jungian = JungianTextSplitter()
+    variants: Dict[str, Callable[[], List[str]]] = {
+        "recursive_chars": RecursiveCharacterTextSplitter(
+            chunk_size=1000, chunk_overlap=200, separators=SEPARATORS
+        ).split_text,
+        "recursive_tokens": RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base",
+            chunk_size=jungian.chunk_size,
+            chunk_overlap=jungian.chunk_overlap,
+            separators=SEPARATORS
+        ).split_text,
+        "jungian_tokens": jungian.split_text,
+        "jungian_stream": lambda text: [
+            chunk for _, chunk in jungian.split_stream(text[i:i + 65536] for i in range(0, len(text), 65536))
+        ],
+    }
+
+    results = {}
+    for name, split in variants.items():
+        metrics = time_call(lambda: split(book), repeat=repeat, warmup=1)
+        metrics["chars_per_s"] = len(book) * metrics["ops_per_s"]
+        metrics.update(_token_stats(jungian, split(book)))
+        results[f"splitter.{name}"] = metrics
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--copies", type=int, default=1, help="Repete o livro sintético N vezes")
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat, args.copies), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Servidores locais que imitam a OpenAI e o Pinecone para benchmarks sem rede.
+
+Um único app FastAPI expõe:
+
+* ``/v1/embeddings`` e ``/v1/chat/completions`` (com streaming SSE) no formato da OpenAI;
+* ``/indexes`` (control plane) e ``/query``, ``/vectors/upsert``, ``/vectors/fetch``,
+  ``/vectors/list``, ``/describe_index_stats`` (data plane) no formato do Pinecone.
+
+Latências e taxa de tokens são configuráveis. Para apontar o backend para cá:
+
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+    PINECONE_CONTROLLER_HOST=http://127.0.0.1:9100
+    PINECONE_INDEX_HOST=http://127.0.0.1:9100
+
+Uso: ``python -m benchmarks.fake_upstreams --port 9100 --tokens-per-second 40``
+"""
+from typing import Dict, Any, Optional
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = (
+    "A sombra contém aspectos da personalidade que o ego não reconhece como seus . "
+    "O processo de individuação conduz à integração do inconsciente com a consciência , "
+    "e os símbolos dos sonhos revelam o caminho do Self ."
+).split()
+
+class FakeUpstreamConfig:
+    """Parâmetros de latência e volume dos upstreams simulados."""
+
+    def __init__(
+        self,
+        embedding_latency_ms: float = 40.0,
+        query_latency_ms: float = 30.0,
+        ttft_ms: float = 400.0,
+        tokens_per_second: float = 40.0,
+        response_tokens: int = 200,
+        dimension: int = 1536,
+        corpus_size: int = 2000,
+        index_name: str = "jung-knowledge",
+        host: str = "http://127.0.0.1:9100"
+    ):
+        self.embedding_latency_ms = embedding_latency_ms
+        self.query_latency_ms = query_latency_ms
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.dimension = dimension
+        self.corpus_size = corpus_size
+        self.index_name = index_name
+        self.host = host
+
+def fake_embedding(item: Any, dimension: int) -> np.ndarray:
+    """Embedding determinístico (e normalizado) derivado do hash da entrada."""
+    seed = int.from_bytes(hashlib.sha1(json.dumps(item).encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def create_fake_app(config: Optional[FakeUpstreamConfig] = None) -> FastAPI:
+    config = config or FakeUpstreamConfig()
+    app = FastAPI(title="Fake OpenAI/Pinecone")
+
+    rng = np.random.default_rng(0)
+    corpus = rng.standard_normal((config.corpus_size, config.dimension)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    state: Dict[str, Any] = {
+        "ids": [f"seed_{i}" for i in range(config.corpus_size)],
+        "vectors": corpus,
+        "metadata": [
+            {"text": " ".join(WORDS[(i % len(WORDS)):] + WORDS[:(i % len(WORDS))]), "doc_id": f"seed_doc_{i // 10}"}
+            for i in range(config.corpus_size)
+        ],
+    }
+
+    def index_description() -> Dict[str, Any]:
+        return {
+            "name": config.index_name,
+            "dimension": config.dimension,
+            "metric": "cosine",
+            "host": config.host.replace("http://", ""),
+            "spec": {"serverless": {"cloud": "aws", "region": "us-west-2"}},
+            "status": {"ready": True, "state": "Ready"},
+            "deletion_protection": "disabled",
+        }
+
+    # --- OpenAI ---
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await asyncio.sleep(config.embedding_latency_ms / 1000)
+        data = []
+        for i, item in enumerate(inputs):
+            vector = fake_embedding(item, body.get("dimensions") or config.dimension)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(str(item)) // 4 + 1 for item in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/v1/models")
+    async def models():
+        # Usado pelos pings de aquecimento/keep-alive do backend
+        return {"object": "list", "data": [{"id": "gpt-4", "object": "model"}]}
+
+    # Cache de prefixo como o da OpenAI: prefixos de mensagens já vistos, a partir de 1024 tokens em blocos de 128
+    seen_prefixes = set()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens, cached_tokens = 0, 0
+        prefix = hashlib.sha1()
+        for message in body.get("messages", []):
+            prefix.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            prompt_tokens += len(str(message.get("content", ""))) // 4 + 1
+            digest = prefix.hexdigest()
+            if digest in seen_prefixes:
+                cached_tokens = prompt_tokens
+            seen_prefixes.add(digest)
+        cached_tokens = cached_tokens // 128 * 128 if cached_tokens >= 1024 else 0
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(config.response_tokens)]
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", "gpt-4")}
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.ttft_ms / 1000 + len(tokens) / config.tokens_per_second)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def stream():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+                payload = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            await asyncio.sleep(config.ttft_ms / 1000)
+            yield chunk({"role": "assistant", "content": ""})
+            interval = 1.0 / config.tokens_per_second
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(interval)
+            yield chunk({}, "stop")
+            if include_usage:
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # --- Pinecone control plane ---
+
+    @app.get("/indexes")
+    async def list_indexes():
+        return {"indexes": [index_description()]}
+
+    @app.get("/indexes/{name}")
+    async def describe_index(name: str):
+        return index_description()
+
+    # --- Pinecone data plane ---
+
+    @app.post("/query")
+    async def query(request: Request):
+        body = await request.json()
+        await asyncio.sleep(config.query_latency_ms / 1000)
+        vector = np.asarray(body["vector"], dtype=np.float32)
+        scores = state["vectors"] @ vector
+        top_k = min(body.get("topK", 3), len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        matches = []
+        for i in best:
+            match = {"id": state["ids"][i], "score": float(scores[i]), "values": []}
+            if body.get("includeMetadata"):
+                match["metadata"] = state["metadata"][i]
+            matches.append(match)
+        return {"matches": matches, "namespace": body.get("namespace", ""), "usage": {"readUnits": 5}}
+
+    @app.post("/vectors/upsert")
+    async def upsert(request: Request):
+        body = await request.json()
+        vectors = body.get("vectors", [])
+        if vectors:
+            new = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+            state["vectors"] = np.concatenate([state["vectors"], new])
+            state["ids"].extend(v["id"] for v in vectors)
+            state["metadata"].extend(v.get("metadata", {}) for v in vectors)
+        return {"upsertedCount": len(vectors)}
+
+    @app.get("/vectors/fetch")
+    async def fetch(request: Request):
+        wanted = set(request.query_params.getlist("ids"))
+        vectors = {
+            vector_id: {"id": vector_id, "values": state["vectors"][i].tolist(), "metadata": state["metadata"][i]}
+            for i, vector_id in enumerate(state["ids"])
+            if vector_id in wanted
+        }
+        return {"vectors": vectors, "namespace": request.query_params.get("namespace", "")}
+
+    @app.get("/vectors/list")
+    async def list_vectors(request: Request):
+        limit = int(request.query_params.get("limit", 100))
+        start = int(request.query_params.get("paginationToken") or 0)
+        ids = state["ids"][start:start + limit]
+        response: Dict[str, Any] = {
+            "vectors": [{"id": vector_id} for vector_id in ids],
+            "namespace": request.query_params.get("namespace", ""),
+        }
+        if start + limit < len(state["ids"]):
+            response["pagination"] = {"next": str(start + limit)}
+        return response
+
+    @app.post("/describe_index_stats")
+    async def describe_index_stats():
+        return {
+            "namespaces": {"": {"vectorCount": len(state["ids"])}},
+            "dimension": config.dimension,
+            "indexFullness": 0.0,
+            "totalVectorCount": len(state["ids"]),
+        }
+
+    return app
+
+def fake_upstream_env(base_url: str) -> Dict[str, str]:
+    """Variáveis de ambiente que apontam o backend para os upstreams simulados."""
+    return {
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "PINECONE_API_KEY": "fake",
+        "PINECONE_CONTROLLER_HOST": base_url,
+        "PINECONE_INDEX_HOST": base_url,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--query-latency-ms", type=float, default=30.0)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeUpstreamConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        query_latency_ms=args.query_latency_ms,
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        corpus_size=args.corpus_size,
+        host=f"http://{args.host}:{args.port}",
+    )
+    uvicorn.run(create_fake_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
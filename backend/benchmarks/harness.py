@@ -0,0 +1,169 @@
+"""Utilitários compartilhados pelos benchmarks: servidores em background, estatísticas e baseline."""
+from typing import List, Dict, Any, Optional, Iterator
+from contextlib import contextmanager
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import httpx
+import uvicorn
+from .fake_upstreams import FakeUpstreamConfig, create_fake_app, fake_upstream_env
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+SECTION_TITLES = ["Sombra", "Anima e Animus", "Self", "Persona", "Individuação", "Sincronicidade"]
+
+def synthetic_book(sections: int = 40, paragraphs_per_section: int = 12, seed: int = 0) -> str:
+    """Gera um texto em Markdown com a estrutura dos livros ingeridos (##, ###, negrito, citações)."""
+    import random
+    rng = random.Random(seed)
+    words = (
+        "o inconsciente coletivo manifesta se em imagens arquetípicas que emergem nos sonhos "
+        "e nos mitos de todas as culturas a consciência do ego precisa dialogar com essas "
+        "imagens para que a personalidade se desenvolva de forma integrada"
+    ).split()
+    parts = []
+    for s in range(sections):
+        title = SECTION_TITLES[s % len(SECTION_TITLES)]
+        parts.append(f"\n## {title} {s}\n")
+        for p in range(paragraphs_per_section):
+            if p % 4 == 0:
+                parts.append(f"\n### Aspecto {p // 4}\n")
+            sentences = []
+            for _ in range(rng.randint(3, 7)):
+                sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 20)))
+                if rng.random() < 0.2:
+                    sentence += f" **{rng.choice(SECTION_TITLES)}**"
+                if rng.random() < 0.1:
+                    sentence += f" [{rng.randint(1, 40)}]"
+                sentences.append(sentence.capitalize() + ".")
+            parts.append(" ".join(sentences) + "\n\n")
+    return "".join(parts)
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "max": max(values) if values else 0.0,
+    }
+
+def time_call(func, repeat: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """Executa ``func`` várias vezes e retorna latências em ms e operações por segundo."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    stats = summarize(samples)
+    return {"p50_ms": stats["p50"], "p95_ms": stats["p95"], "ops_per_s": 1000 / stats["mean"]}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextmanager
+def fake_upstreams(config: Optional[FakeUpstreamConfig] = None) -> Iterator[str]:
+    """Sobe os upstreams simulados numa thread e retorna a URL base."""
+    port = free_port()
+    config = config or FakeUpstreamConfig()
+    config.host = f"http://127.0.0.1:{port}"
+    server = uvicorn.Server(uvicorn.Config(create_fake_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield config.host
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+@contextmanager
+def backend_server(upstream_url: str, workers: int = 1, extra_env: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """Sobe ``uvicorn main:app`` como subprocesso apontando para os upstreams simulados."""
+    import tempfile
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix="jung-bench-")
+    env = {
+        **os.environ,
+        **fake_upstream_env(upstream_url),
+        "CONTENT_STORE_PATH": os.path.join(data_dir, "content_store.sqlite3"),
+        "WARMUP_DB_PATH": os.path.join(data_dir, "query_stats.sqlite3"),
+        **(extra_env or {}),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        # Os logs INFO do backend poluem a saída; BENCH_VERBOSE=1 os mantém
+        stdout=None if os.getenv("BENCH_VERBOSE") else subprocess.DEVNULL,
+        stderr=None if os.getenv("BENCH_VERBOSE") else subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Backend terminou durante a inicialização (código {process.returncode})")
+            try:
+                if httpx.get(f"{url}/api/startup-check", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError("Backend não respondeu ao startup-check em 60s")
+            time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+# Métricas em que "maior é melhor"; as demais (latências) devem diminuir
+HIGHER_IS_BETTER = ("ops_per_s", "tokens_per_s", "chars_per_s", "requests_per_s", "max_concurrent_streams")
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Lista as métricas que pioraram mais que ``tolerance`` (fração) em relação ao baseline."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if not reference or not isinstance(value, (int, float)):
+                continue
+            change = (value - reference) / reference
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{name}.{metric}: {reference:.3f} -> {value:.3f} ({change:+.1%})")
+    return regressions
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(results: Dict[str, Any], path: str = BASELINE_PATH) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
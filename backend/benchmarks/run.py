@@ -0,0 +1,56 @@
+"""Executa a suíte de benchmarks e compara com o baseline versionado.
+
+Uso (a partir de backend/):
+
+    python -m benchmarks.run                 # roda e compara com benchmarks/baseline.json
+    python -m benchmarks.run --save          # roda e grava um novo baseline
+    python -m benchmarks.run --skip-load     # apenas microbenchmarks
+
+Sai com código 1 se alguma métrica piorar mais que ``--tolerance``.
+"""
+import argparse
+import json
+import sys
+from . import bench_load, bench_micro, bench_splitter
+from .fake_upstreams import FakeUpstreamConfig
+from .harness import compare_to_baseline, load_baseline, save_baseline
+
+# Cenário de carga do baseline: upstreams rápidos para expor o custo do próprio backend
+LOAD_SCENARIO = dict(concurrency=50, requests=200, workers=1)
+LOAD_UPSTREAMS = dict(ttft_ms=200.0, tokens_per_second=100.0, response_tokens=150)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="Grava os resultados como novo baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Piora relativa tolerada (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args()
+
+    results = bench_micro.run(args.repeat)
+    results.update(bench_splitter.run(max(args.repeat // 2, 3)))
+    if not args.skip_load:
+        results["load.chat_stream"] = bench_load.run_spawned(
+            config=FakeUpstreamConfig(**LOAD_UPSTREAMS), **LOAD_SCENARIO
+        )
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        save_baseline(results)
+        print("Baseline atualizado.")
+        return
+
+    baseline = load_baseline()
+    if not baseline:
+        print("Nenhum baseline encontrado; rode com --save para criar.")
+        return
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("Regressões em relação ao baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Sem regressões em relação ao baseline.")
+
+if __name__ == "__main__":
+    main()
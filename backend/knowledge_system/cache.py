@@ -0,0 +1,377 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import logging
+import numpy as np
+from .telemetry import record_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- Codificação binária ---
+
+_VECTOR_TAG = b"\x01"
+_JSON_TAG = b"\x02"
+
+def encode_value(value: Any) -> bytes:
+    """Vetores de floats viram float32 crus (4 bytes/dimensão); o resto vira JSON."""
+    if isinstance(value, np.ndarray) or (
+        isinstance(value, (list, tuple)) and value and isinstance(value[0], float)
+    ):
+        return _VECTOR_TAG + np.asarray(value, dtype=np.float32).tobytes()
+    payload = orjson.dumps(value) if orjson is not None else json.dumps(value).encode()
+    return _JSON_TAG + payload
+
+def decode_value(data: bytes) -> Any:
+    tag, payload = data[:1], data[1:]
+    if tag == _VECTOR_TAG:
+        return np.frombuffer(payload, dtype=np.float32).tolist()
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+def hash_key(*parts: Any) -> str:
+    """Chave compacta e estável a partir de partes arbitrárias (textos, bytes de vetores...)."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+# --- L1: em processo ---
+
+class LocalCache:
+    """LRU em memória com TTL por entrada (L1, privado de cada worker)."""
+
+    def __init__(self, max_items: int = 10_000):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        item = self._items.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._items[key]
+            return False, None
+        self._items.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._items[key] = (time.monotonic() + ttl if ttl else None, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+# --- L2: compartilhado entre workers ---
+
+class SQLiteCacheBackend:
+    """L2 compartilhado pelos workers do mesmo host num arquivo SQLite (WAL)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl if ttl else None)
+            )
+            # Limpeza ocasional de entradas expiradas
+            if random.random() < 0.001:
+                self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Grava apenas se a chave não existir (ou estiver expirada). Usado como lock."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ? AND expires_at IS NOT NULL AND expires_at < ?", (key, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        """Apaga a chave só se ela ainda guardar ``value`` (libera um lock sem soltar o de outro worker)."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, value))
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            value = int(bytes(row[0])) + 1 if row else 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, NULL)",
+                (key, str(value).encode())
+            )
+            self._conn.commit()
+        return value
+
+_DELETE_IF_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+class RedisCacheBackend:
+    """L2 em qualquer servidor que fale o protocolo Redis (Redis, KeyDB, Valkey...).
+
+    Aceita um ``client`` já construído, o que permite usar um substituto local
+    compatível (ex.: fakeredis) em testes.
+    """
+
+    def __init__(self, url: Optional[str] = None, client: Any = None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError("CACHE_BACKEND=redis requer o pacote 'redis' (pip install redis)")
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, value, px=int(ttl * 1000) if ttl else None, nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        """Apaga a chave só se ela ainda guardar ``value``, atomicamente (script Lua)."""
+        return bool(self.client.eval(_DELETE_IF_SCRIPT, 1, key, value))
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+# --- Cache em camadas ---
+
+class TieredCache:
+    """Cache em duas camadas: L1 em processo e L2 opcional compartilhado entre workers.
+
+    As chaves são agrupadas em namespaces versionados (``embeddings``,
+    ``retrieval``, ``responses``...). ``invalidate(namespace)`` incrementa a
+    versão no L2, tornando inalcançáveis as entradas antigas em todos os
+    workers; cada worker relê a versão a cada ``version_ttl`` segundos.
+    ``get_or_compute`` evita stampede: requisições simultâneas pela mesma chave
+    compartilham um único cálculo no processo, e um lock no L2 faz os demais
+    workers esperarem o valor em vez de recalculá-lo.
+    """
+
+    def __init__(
+        self,
+        l2: Any = None,
+        l1_max_items: int = 10_000,
+        default_ttl: Optional[float] = 3600.0,
+        prefix: str = "jung",
+        version_ttl: float = 5.0,
+        lock_ttl: float = 30.0,
+        lock_wait: float = 5.0
+    ):
+        self.l1 = LocalCache(l1_max_items)
+        self.l2 = l2
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.version_ttl = version_ttl
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._local_versions: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    # Versões de namespace
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:ns:{namespace}:version"
+
+    def _namespace_version(self, namespace: str) -> int:
+        if self.l2 is None:
+            return self._local_versions.get(namespace, 0)
+        cached = self._versions.get(namespace)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        raw = self.l2.get(self._version_key(namespace))
+        version = int(raw) if raw else 0
+        self._versions[namespace] = (time.monotonic() + self.version_ttl, version)
+        return version
+
+    async def _full_key(self, namespace: str, key: str) -> str:
+        if self.l2 is None:
+            version = self._namespace_version(namespace)
+        else:
+            cached = self._versions.get(namespace)
+            if cached and cached[0] > time.monotonic():
+                version = cached[1]
+            else:
+                version = await asyncio.to_thread(self._namespace_version, namespace)
+        return f"{self.prefix}:{namespace}:v{version}:{key}"
+
+    def invalidate_sync(self, namespace: str) -> None:
+        """Invalida todas as entradas de um namespace (versão síncrona, para a ingestão)."""
+        if self.l2 is None:
+            self._local_versions[namespace] = self._local_versions.get(namespace, 0) + 1
+        else:
+            version = self.l2.incr(self._version_key(namespace))
+            self._versions[namespace] = (time.monotonic() + self.version_ttl, version)
+        logger.info(f"Cache invalidado para o namespace '{namespace}'")
+
+    async def invalidate(self, namespace: str) -> None:
+        await asyncio.to_thread(self.invalidate_sync, namespace)
+
+    # Leitura e escrita
+
+    async def get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        full_key = await self._full_key(namespace, key)
+        return await self._get(namespace, full_key)
+
+    async def _get(self, namespace: str, full_key: str) -> Tuple[bool, Any]:
+        found, value = self.l1.get(full_key)
+        record_cache(f"{namespace}.l1", found)
+        if found or self.l2 is None:
+            return found, value
+        raw = await asyncio.to_thread(self.l2.get, full_key)
+        record_cache(f"{namespace}.l2", raw is not None)
+        if raw is None:
+            return False, None
+        value = decode_value(raw)
+        self.l1.set(full_key, value, self.default_ttl)
+        return True, value
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        full_key = await self._full_key(namespace, key)
+        await self._set(full_key, value, ttl)
+
+    async def _set(self, full_key: str, value: Any, ttl: Optional[float]) -> None:
+        ttl = ttl if ttl is not None else self.default_ttl
+        self.l1.set(full_key, value, ttl)
+        if self.l2 is not None:
+            await asyncio.to_thread(self.l2.set, full_key, encode_value(value), ttl)
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """Retorna o valor em cache ou calcula (uma única vez) e grava nas duas camadas.
+
+        O cálculo roda numa task própria, que todos os interessados aguardam via
+        ``asyncio.shield``: se a requisição que o iniciou for cancelada (cliente
+        desconectou), as demais continuam esperando o mesmo resultado.
+        """
+        full_key = await self._full_key(namespace, key)
+        found, value = await self._get(namespace, full_key)
+        if found:
+            return value
+
+        task = self._inflight.get(full_key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_with_l2_lock(namespace, full_key, compute, ttl))
+            self._inflight[full_key] = task
+            task.add_done_callback(lambda done: self._compute_done(full_key, done))
+        return await asyncio.shield(task)
+
+    def _compute_done(self, full_key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(full_key) is task:
+            del self._inflight[full_key]
+        # Evita o aviso de exceção não observada quando ninguém mais espera
+        if not task.cancelled():
+            task.exception()
+
+    async def _compute_with_l2_lock(self, namespace: str, full_key: str, compute, ttl) -> Any:
+        lock_key = f"{full_key}:lock"
+        # Token aleatório: só quem adquiriu o lock o libera
+        token = os.urandom(16).hex().encode()
+        acquired = False
+        if self.l2 is not None:
+            acquired = await asyncio.to_thread(self.l2.add, lock_key, token, self.lock_ttl)
+            if not acquired:
+                # Outro worker está calculando: espera o valor aparecer no L2
+                deadline = time.monotonic() + self.lock_wait
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                    raw = await asyncio.to_thread(self.l2.get, full_key)
+                    if raw is not None:
+                        value = decode_value(raw)
+                        self.l1.set(full_key, value, ttl if ttl is not None else self.default_ttl)
+                        return value
+                # Desistiu de esperar: calcula por conta própria, com o lock se ele tiver sido liberado
+                acquired = await asyncio.to_thread(self.l2.add, lock_key, token, self.lock_ttl)
+        try:
+            value = await compute()
+            await self._set(full_key, value, ttl)
+            return value
+        finally:
+            if acquired:
+                await asyncio.to_thread(self.l2.delete_if, lock_key, token)
+
+def create_cache_from_env() -> Optional[TieredCache]:
+    """Cria o cache conforme CACHE_BACKEND: 'memory' (só L1), 'sqlite', 'redis' ou 'none'."""
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        l2 = SQLiteCacheBackend(os.getenv("CACHE_SQLITE_PATH", "data/cache.sqlite3"))
+    elif backend == "redis":
+        l2 = RedisCacheBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    elif backend == "memory":
+        l2 = None
+    else:
+        raise ValueError(f"CACHE_BACKEND desconhecido: {backend}")
+    logger.info(f"Cache inicializado com backend L2 '{backend}'")
+    return TieredCache(
+        l2=l2,
+        l1_max_items=int(os.getenv("CACHE_L1_MAX_ITEMS", "10000")),
+        default_ttl=float(os.getenv("CACHE_DEFAULT_TTL", "3600"))
+    )
@@ -1,23 +1,19 @@
-from typing import List, Dict, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Dict, Any, Optional
 from langchain.docstore.document import Document
+from .text_splitter import JungianTextSplitter
+import hashlib
 import re
 
+def document_id(text: str) -> str:
+    """Gera um id estável para um documento a partir do seu conteúdo."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
 class JungianTextProcessor:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=[
-                "\n## ",  # Seções principais
-                "\n### ",  # Subseções
-                "\n\n",    # Parágrafos
-                "\n",      # Linhas
-                ". ",      # Sentenças
-                " ",       # Palavras
-                ""        # Caracteres
-            ]
-        )
+        # Metadados globais de cada documento, guardados uma única vez por doc_id
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # Chunks medidos em tokens (CHUNK_SIZE_TOKENS), respeitando seções, parágrafos e sentenças
+        self.text_splitter = JungianTextSplitter()
     
     def extract_metadata(self, text: str) -> Dict[str, Any]:
         """Extrai metadados do texto."""
@@ -41,26 +37,35 @@ class JungianTextProcessor:
         
         return metadata
     
-    def process_text(self, text: str) -> List[Document]:
-        """Processa o texto em chunks com metadados."""
+    def process_text(self, text: str, doc_id: Optional[str] = None) -> List[Document]:
+        """Processa o texto em chunks com metadados.
+
+        Os metadados globais ficam em ``self.documents[doc_id]``; cada chunk
+        carrega apenas o ``doc_id`` e os seus metadados locais.
+        """
+        doc_id = doc_id or document_id(text)
+
         # Extrai metadados globais
         global_metadata = self.extract_metadata(text)
+        self.documents[doc_id] = global_metadata
         
-        # Divide o texto em chunks
-        chunks = self.text_splitter.split_text(text)
+        # Divide o texto em chunks (offsets no texto original)
+        spans = self.text_splitter.split_spans(text)
         
         documents = []
-        for i, chunk in enumerate(chunks):
+        for i, span in enumerate(spans):
+            chunk = text[span.start:span.end]
             # Extrai metadados específicos do chunk
             chunk_metadata = self.extract_metadata(chunk)
             
-            # Combina com metadados globais
+            # Referencia os metadados globais pelo doc_id em vez de copiá-los
             metadata = {
+                "doc_id": doc_id,
                 "chunk_id": i,
-                "total_chunks": len(chunks),
-                "global_categories": global_metadata["categories"],
-                "global_concepts": global_metadata["concepts"],
-                "global_references": global_metadata["references"],
+                "total_chunks": len(spans),
+                "start_offset": span.start,
+                "end_offset": span.end,
+                "token_count": span.tokens,
                 "local_categories": chunk_metadata["categories"],
                 "local_concepts": chunk_metadata["concepts"],
                 "local_references": chunk_metadata["references"]
@@ -127,7 +132,8 @@ class JungianTextProcessor:
         concepts = set()
         for doc in documents:
             concepts.update(doc.metadata.get("local_concepts", []))
-            concepts.update(doc.metadata.get("global_concepts", []))
+            global_metadata = self.documents.get(doc.metadata.get("doc_id"), {})
+            concepts.update(global_metadata.get("concepts", []))
         
         return list(concepts)
     
@@ -136,7 +142,8 @@ class JungianTextProcessor:
         citations = set()
         for doc in documents:
             citations.update(doc.metadata.get("local_references", []))
-            citations.update(doc.metadata.get("global_references", []))
+            global_metadata = self.documents.get(doc.metadata.get("doc_id"), {})
+            citations.update(global_metadata.get("references", []))
         
         return list(citations)
     
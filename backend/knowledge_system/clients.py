@@ -0,0 +1,257 @@
+from typing import Any, Callable, List, Optional, Tuple
+import asyncio
+import os
+import logging
+import httpx
+from openai import AsyncOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from pinecone import Pinecone
+from .telemetry import UPSTREAM_INFLIGHT, UPSTREAM_PINGS, UPSTREAM_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class _InflightRelease:
+    """Decrementa o gauge de requisições em andamento uma única vez."""
+
+    def __init__(self, upstream: str):
+        self.gauge = UPSTREAM_INFLIGHT.labels(upstream=upstream)
+        self.gauge.inc()
+        self.released = False
+
+    def __call__(self) -> None:
+        if not self.released:
+            self.released = True
+            self.gauge.dec()
+
+class _TrackedAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+class _TrackedSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+class InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    """Transporte httpx que conta requisições em andamento até o corpo da resposta ser fechado.
+
+    Respostas em streaming (SSE do chat) ocupam a conexão até o fim, então o
+    gauge reflete a ocupação real do pool.
+    """
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        release = _InflightRelease(self.upstream)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _TrackedAsyncStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Versão síncrona de ``InstrumentedAsyncTransport`` (ingestão, build do ConceptTagger)."""
+
+    def __init__(self, upstream: str, transport: httpx.BaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        release = _InflightRelease(self.upstream)
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _TrackedSyncStream(response.stream, release)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+class UpstreamClients:
+    """Fábrica única dos clientes de upstream (OpenAI e Pinecone) com pools compartilhados.
+
+    Todos os clientes da OpenAI (chat, embeddings, transcrição) usam o mesmo
+    pool httpx com keep-alive ajustado e HTTP/2 quando o pacote ``h2`` está
+    instalado; os índices Pinecone usam um pool urllib3 dimensionado para as
+    buscas concorrentes. ``warm_up()`` abre as conexões (TLS incluído) antes do
+    primeiro usuário e ``start_keepalive()`` as mantém aquecidas em períodos
+    ociosos. A saturação de cada pool é ``jung_upstream_inflight_requests`` /
+    ``jung_upstream_pool_max_connections``.
+    """
+
+    def __init__(
+        self,
+        openai_api_key: Optional[str] = None,
+        openai_base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None
+    ):
+        self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+        self.openai_base_url = (
+            openai_base_url or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+        ).rstrip("/")
+        if max_connections is None:
+            max_connections = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+        if max_keepalive_connections is None:
+            max_keepalive_connections = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+        if keepalive_expiry is None:
+            keepalive_expiry = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "120"))
+        if http2 is None:
+            http2 = os.getenv("UPSTREAM_HTTP2", "true").lower() != "false"
+        self.http2 = bool(http2 and _http2_available())
+        self.prewarm_connections = int(os.getenv("UPSTREAM_PREWARM_CONNECTIONS", "4"))
+        self.keepalive_interval = float(os.getenv("UPSTREAM_KEEPALIVE_INTERVAL", "30"))
+        self.pinecone_pool_threads = int(os.getenv("PINECONE_POOL_THREADS", "4"))
+        self.pinecone_pool_maxsize = int(os.getenv("PINECONE_POOL_MAXSIZE", "32"))
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        timeout = httpx.Timeout(
+            float(os.getenv("UPSTREAM_TIMEOUT", "60")),
+            connect=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+        )
+        self.openai_http = httpx.AsyncClient(
+            transport=InstrumentedAsyncTransport("openai", httpx.AsyncHTTPTransport(http2=self.http2, limits=limits)),
+            timeout=timeout
+        )
+        self.openai_http_sync = httpx.Client(
+            transport=InstrumentedTransport("openai_sync", httpx.HTTPTransport(http2=self.http2, limits=limits)),
+            timeout=timeout
+        )
+        UPSTREAM_POOL_SIZE.labels(upstream="openai").set(max_connections)
+        UPSTREAM_POOL_SIZE.labels(upstream="openai_sync").set(max_connections)
+
+        self._openai: Optional[AsyncOpenAI] = None
+        self._pinecone_indexes: List[Tuple[str, Any]] = []
+        self._keepalive_task: Optional[asyncio.Task] = None
+        logger.info(
+            f"Pools de upstream configurados: max_connections={max_connections}, "
+            f"keepalive={max_keepalive_connections}/{keepalive_expiry}s, http2={self.http2}"
+        )
+
+    # --- Fábricas ---
+
+    def openai(self) -> AsyncOpenAI:
+        """Cliente assíncrono da OpenAI (ex.: transcrição) no pool compartilhado."""
+        if self._openai is None:
+            self._openai = AsyncOpenAI(
+                api_key=self.openai_api_key,
+                base_url=self.openai_base_url,
+                http_client=self.openai_http
+            )
+        return self._openai
+
+    def chat_model(self, **kwargs: Any) -> ChatOpenAI:
+        return ChatOpenAI(http_client=self.openai_http_sync, http_async_client=self.openai_http, **kwargs)
+
+    def embeddings(self, **kwargs: Any) -> OpenAIEmbeddings:
+        return OpenAIEmbeddings(http_client=self.openai_http_sync, http_async_client=self.openai_http, **kwargs)
+
+    def pinecone(self, api_key: Optional[str] = None) -> Pinecone:
+        return Pinecone(api_key=api_key, pool_threads=self.pinecone_pool_threads)
+
+    def pinecone_index(self, pc: Pinecone, name: str, host: str) -> Any:
+        """Abre um índice Pinecone com pool dimensionado e o registra para aquecimento."""
+        index = pc.Index(
+            name,
+            host=host,
+            pool_threads=self.pinecone_pool_threads,
+            connection_pool_maxsize=self.pinecone_pool_maxsize
+        )
+        self._pinecone_indexes.append((name, index))
+        UPSTREAM_POOL_SIZE.labels(upstream="pinecone").set(self.pinecone_pool_maxsize * len(self._pinecone_indexes))
+        return index
+
+    # --- Aquecimento e keep-alive ---
+
+    async def _ping_openai(self) -> None:
+        try:
+            response = await self.openai_http.get(
+                f"{self.openai_base_url}/models",
+                headers={"Authorization": f"Bearer {self.openai_api_key}"}
+            )
+            UPSTREAM_PINGS.labels(upstream="openai", result="ok" if response.is_success else "error").inc()
+        except Exception as e:
+            UPSTREAM_PINGS.labels(upstream="openai", result="error").inc()
+            logger.warning(f"Ping na OpenAI falhou: {str(e)}")
+
+    async def _ping_pinecone(self, name: str, index: Any) -> None:
+        try:
+            await asyncio.to_thread(index.describe_index_stats)
+            UPSTREAM_PINGS.labels(upstream="pinecone", result="ok").inc()
+        except Exception as e:
+            UPSTREAM_PINGS.labels(upstream="pinecone", result="error").inc()
+            logger.warning(f"Ping no índice Pinecone '{name}' falhou: {str(e)}")
+
+    async def _ping_all(self, connections: int) -> int:
+        # Com HTTP/2 uma única conexão multiplexa as requisições: basta um ping na OpenAI
+        openai_pings = 1 if self.http2 else connections
+        pings = [self._ping_openai() for _ in range(openai_pings)]
+        for name, index in self._pinecone_indexes:
+            pings.extend(self._ping_pinecone(name, index) for _ in range(connections))
+        await asyncio.gather(*pings)
+        return len(pings)
+
+    async def warm_up(self, connections: Optional[int] = None) -> None:
+        """Abre ``connections`` conexões por upstream com requisições leves e concorrentes."""
+        count = await self._ping_all(connections or self.prewarm_connections)
+        logger.info(f"Conexões de upstream aquecidas ({count} pings)")
+
+    async def _keepalive_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self._ping_all(self.prewarm_connections)
+
+    def start_keepalive(self) -> None:
+        """Agenda pings periódicos para evitar que conexões ociosas sejam fechadas (0 desativa)."""
+        if self.keepalive_interval > 0 and self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+    async def aclose(self) -> None:
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            await asyncio.gather(self._keepalive_task, return_exceptions=True)
+            self._keepalive_task = None
+        await self.openai_http.aclose()
+        self.openai_http_sync.close()
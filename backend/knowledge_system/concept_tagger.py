@@ -0,0 +1,111 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import os
+import logging
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from .knowledge_base import JungianKnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+class ConceptTagger:
+    """Associa textos a conceitos/arquétipos da base por similaridade de embeddings.
+
+    Cada conceito e arquétipo de ``JungianKnowledgeBase`` é embutido uma única
+    vez numa matriz em memória. Depois disso, marcar chunks na ingestão ou
+    consultas no chat é só um produto matricial com embeddings que já temos,
+    sem chamadas extras à OpenAI.
+
+    A matriz acompanha ``knowledge_base.version``: quando conceitos ou
+    arquétipos são adicionados, só as entradas novas ou alteradas são
+    embutidas de novo (``refresh`` na ingestão, ``arefresh`` no chat).
+    """
+
+    def __init__(
+        self,
+        knowledge_base: JungianKnowledgeBase,
+        embeddings: Embeddings,
+        top_n: Optional[int] = None,
+        min_score: Optional[float] = None
+    ):
+        self.kb = knowledge_base
+        self.embeddings = embeddings
+        self.top_n = top_n if top_n is not None else int(os.getenv("CONCEPT_TAG_TOP_N", "3"))
+        # Cossenos de text-embedding-ada-002 ficam concentrados acima de ~0.7
+        self.min_score = min_score if min_score is not None else float(os.getenv("CONCEPT_TAG_MIN_SCORE", "0.78"))
+        self.names: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+        # Embeddings normalizados por nome, com o texto de onde vieram
+        self._vectors: Dict[str, Tuple[str, np.ndarray]] = {}
+        self.version: Optional[int] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @staticmethod
+    def _describe(entry) -> str:
+        return f"{entry.name}: {entry.description}"
+
+    def _pending(self) -> Tuple[int, Dict[str, str], List[str]]:
+        """(versão da base, textos de todas as entradas, nomes que precisam de embedding)."""
+        version = self.kb.version
+        texts = {name: self._describe(entry) for name, entry in {**self.kb.concepts, **self.kb.archetypes}.items()}
+        missing = [name for name, text in texts.items() if self._vectors.get(name, ("",))[0] != text]
+        return version, texts, missing
+
+    def _apply(self, version: int, texts: Dict[str, str], names: List[str], vectors: Sequence[Sequence[float]]) -> None:
+        for name, vector in zip(names, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            self._vectors[name] = (texts[name], vector / np.linalg.norm(vector))
+        self._vectors = {name: self._vectors[name] for name in texts}
+        self.names = list(self._vectors)
+        self.matrix = np.stack([vector for _, vector in self._vectors.values()]) if self.names else None
+        self.version = version
+        if self.names:
+            logger.info(f"Matriz de conceitos construída com {len(self.names)} entradas ({len(names)} novas).")
+        else:
+            logger.info("Base de conhecimento sem conceitos; marcação de conceitos desativada.")
+
+    def refresh(self) -> None:
+        """Atualiza a matriz se a base mudou. Uma chamada de embedding em lote, só para entradas novas."""
+        if self.version == self.kb.version:
+            return
+        version, texts, missing = self._pending()
+        vectors = self.embeddings.embed_documents([texts[name] for name in missing]) if missing else []
+        self._apply(version, texts, missing, vectors)
+
+    async def arefresh(self) -> None:
+        """Versão assíncrona de ``refresh`` para o caminho do chat."""
+        if self.version == self.kb.version:
+            return
+        async with self._refresh_lock:
+            if self.version == self.kb.version:
+                return
+            version, texts, missing = self._pending()
+            vectors = await self.embeddings.aembed_documents([texts[name] for name in missing]) if missing else []
+            self._apply(version, texts, missing, vectors)
+
+    def build(self) -> None:
+        """(Re)constrói a matriz de embeddings de conceitos do zero."""
+        self._vectors = {}
+        self.version = None
+        self.refresh()
+
+    def tag(self, vectors: Sequence[Sequence[float]], top_n: Optional[int] = None) -> List[List[str]]:
+        """Retorna, para cada vetor, os conceitos mais próximos acima de ``min_score``.
+
+        Atualiza a matriz antes, se a base mudou (chamada síncrona de embedding).
+        """
+        self.refresh()
+        if self.matrix is None or len(vectors) == 0:
+            return [[] for _ in vectors]
+        top_n = min(top_n or self.top_n, len(self.names))
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = vectors @ self.matrix.T
+        best = np.argsort(-scores, axis=1)[:, :top_n]
+        return [
+            [self.names[j] for j in row if scores[i, j] >= self.min_score]
+            for i, row in enumerate(best)
+        ]
+
+    def tag_one(self, vector: Sequence[float], top_n: Optional[int] = None) -> List[str]:
+        return self.tag([vector], top_n)[0]
@@ -0,0 +1,153 @@
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+import json
+import os
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JungianContentStore:
+    """Armazena localmente o texto dos chunks e os metadados de cada documento.
+
+    O índice vetorial guarda apenas campos compactos (``doc_id``, ``chunk_index``
+    e alguns campos filtráveis). O texto completo de cada chunk e os metadados
+    globais do documento ficam aqui, gravados uma única vez e consultados por id.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CONTENT_STORE_PATH", "data/content_store.sqlite3")
+        if self.path != ":memory:":
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id);
+            """
+        )
+        self._conn.commit()
+
+    def put_document(self, doc_id: str, metadata: Dict[str, Any]) -> None:
+        """Grava (ou substitui) os metadados de um documento."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, metadata) VALUES (?, ?)",
+                (doc_id, json.dumps(metadata, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def put_documents(self, documents: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Grava vários documentos no formato (doc_id, metadata) numa única transação."""
+        rows = [(doc_id, json.dumps(metadata, ensure_ascii=False)) for doc_id, metadata in documents]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, metadata) VALUES (?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Percorre todos os documentos em ordem de doc_id, lendo em lotes."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT doc_id, metadata FROM documents WHERE doc_id > ? ORDER BY doc_id LIMIT ?",
+                    (last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for doc_id, metadata in rows:
+                yield doc_id, json.loads(metadata)
+            last = rows[-1][0]
+
+    def iter_chunk_ids(self, batch_size: int = 1000) -> Iterator[List[str]]:
+        """Percorre os ids de todos os chunks em lotes, em ordem de chunk_id."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE chunk_id > ? ORDER BY chunk_id LIMIT ?",
+                    (last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield [row[0] for row in rows]
+            last = rows[-1][0]
+
+    def put_chunks(self, chunks: Iterable[Tuple[str, str, int, str, Dict[str, Any]]]) -> None:
+        """Grava chunks no formato (chunk_id, doc_id, chunk_index, text, metadata)."""
+        rows = [
+            (chunk_id, doc_id, chunk_index, text, json.dumps(metadata, ensure_ascii=False))
+            for chunk_id, doc_id, chunk_index, text, metadata in chunks
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, doc_id, chunk_index, text, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def get_documents(self, doc_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Recupera os metadados de vários documentos de uma vez."""
+        ids = list(dict.fromkeys(doc_ids))
+        if not ids:
+            return {}
+        placeholders = ",".join("?" for _ in ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT doc_id, metadata FROM documents WHERE doc_id IN ({placeholders})",
+                ids
+            ).fetchall()
+        return {doc_id: json.loads(metadata) for doc_id, metadata in rows}
+
+    def get_chunks(self, chunk_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Recupera texto e metadados de vários chunks de uma vez."""
+        ids = list(dict.fromkeys(chunk_ids))
+        if not ids:
+            return {}
+        placeholders = ",".join("?" for _ in ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_id, doc_id, chunk_index, text, metadata FROM chunks "
+                f"WHERE chunk_id IN ({placeholders})",
+                ids
+            ).fetchall()
+        return {
+            chunk_id: {
+                "doc_id": doc_id,
+                "chunk_index": chunk_index,
+                "text": text,
+                "metadata": json.loads(metadata)
+            }
+            for chunk_id, doc_id, chunk_index, text, metadata in rows
+        }
+
+    def delete_document(self, doc_id: str) -> None:
+        """Remove um documento e todos os seus chunks."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Any, AsyncIterator, Sequence
 from pydantic import BaseModel
 
 class JungianConcept(BaseModel):
@@ -33,7 +33,19 @@ class JungianKnowledgeBase:
         self.archetypes: Dict[str, JungianArchetype] = {}
         self.processes: Dict[str, TherapeuticProcess] = {}
         self.vector_store = vector_store
+        # Incrementada a cada conceito/arquétipo adicionado (derivados como a matriz do ConceptTagger se atualizam)
+        self.version = 0
     
+    @staticmethod
+    def _to_result(doc) -> Dict:
+        return {
+            "title": doc.metadata.get("title", ""),
+            "content": doc.page_content,
+            "category": doc.metadata.get("category", ""),
+            "references": doc.metadata.get("references", []),
+            "confidence": 0.8  # TODO: Implementar cálculo de confiança
+        }
+
     async def query(self, query: str, max_results: int = 3) -> List[Dict]:
         """Realiza uma busca semântica na base de conhecimento."""
         try:
@@ -42,26 +54,46 @@ class JungianKnowledgeBase:
                 k=max_results
             )
             
-            return [
-                {
-                    "title": doc.metadata.get("title", ""),
-                    "content": doc.page_content,
-                    "category": doc.metadata.get("category", ""),
-                    "references": doc.metadata.get("references", []),
-                    "confidence": 0.8  # TODO: Implementar cálculo de confiança
-                }
-                for doc in results
-            ]
+            return [self._to_result(doc) for doc in results]
         except Exception as e:
             raise Exception(f"Erro ao realizar busca: {str(e)}")
+
+    async def query_many(
+        self,
+        queries: Sequence[str],
+        max_results: int = 3,
+        max_concurrency: int = 8
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Realiza várias buscas semânticas, produzindo cada resultado assim que fica pronto.
+
+        Cada item traz o índice da consulta na lista original; consultas
+        repetidas são buscadas uma vez e repetidas para cada índice.
+        """
+        positions: Dict[str, List[int]] = {}
+        for i, query in enumerate(queries):
+            positions.setdefault(query, []).append(i)
+
+        async for query, documents, error in self.vector_store.similarity_search_many(
+            queries,
+            k=max_results,
+            max_concurrency=max_concurrency
+        ):
+            results = [self._to_result(doc) for doc in documents]
+            for i in positions[query]:
+                item: Dict[str, Any] = {"index": i, "query": query, "results": results}
+                if error is not None:
+                    item["error"] = f"Erro ao realizar busca: {str(error)}"
+                yield item
     
     def add_concept(self, concept: JungianConcept) -> None:
         """Adiciona um conceito à base de conhecimento."""
         self.concepts[concept.name] = concept
+        self.version += 1
     
     def add_archetype(self, archetype: JungianArchetype) -> None:
         """Adiciona um arquétipo à base de conhecimento."""
         self.archetypes[archetype.name] = archetype
+        self.version += 1
     
     def add_process(self, process: TherapeuticProcess) -> None:
         """Adiciona um processo terapêutico à base de conhecimento."""
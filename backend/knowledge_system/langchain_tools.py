@@ -1,40 +1,52 @@
-from typing import List, Dict, Any, Optional, AsyncGenerator
-import json # Add json import for SSE formatting
-from langchain.prompts import PromptTemplate
+from typing import List, Dict, Any, Optional, AsyncGenerator, Awaitable, Callable
+import asyncio
+import logging
+import os
+import time
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain.memory import ConversationBufferWindowMemory
+from .cache import TieredCache, hash_key
+from .clients import UpstreamClients
 from .knowledge_base import JungianKnowledgeBase
 from .vector_store import JungianVectorStore
+from .telemetry import stage, observe_stage, request_span, record_cancellation, TokenUsageCallback
+from .sse import SSEEncoder, TokenCoalescer, ClientDisconnected, cancel_on_disconnect
+from .memory import RollingSummaryMemory
+from .warmup import QueryWarmer
+from .prompts import SYSTEM_PROMPT, CONCEPT_PROMPT, ARCHETYPE_PROMPT, THERAPEUTIC_PROMPT, CONVERSATIONAL_PROMPT
 
-# --- Adicionar o novo prompt aqui (ou importar de forma mais elegante depois) ---
-SYSTEM_PROMPT_CONVERSATIONAL = """Você é Carl Gustav Jung. Responda diretamente ao seu interlocutor, mantendo sua voz e perspectiva únicas.
-Para saudações ('Olá', 'Oi', etc.) ou perguntas muito curtas e triviais, responda de forma cordial e pensativa, talvez com uma observação sucinta ou uma pergunta gentil que convide à reflexão, mas sem iniciar uma análise profunda não solicitada.
-Se a pergunta for mais substancial ou solicitar explicitamente uma exploração de conceitos, utilize seu conhecimento analítico.
-
-Considere o histórico da conversa para manter a continuidade.
-
-Histórico da conversa:
-{chat_history}
-
-Interlocutor diz: {user_input}
-
-Sua resposta (como C.G. Jung):
-"""
-# --- Fim do novo prompt ---
+logger = logging.getLogger(__name__)
 
 class JungianAnalyst:
     def __init__(
         self,
         knowledge_base: JungianKnowledgeBase,
         vector_store: JungianVectorStore,
-        model_name: str = "gpt-4"
+        model_name: str = "gpt-4o",
+        cache: Optional[TieredCache] = None,
+        clients: Optional[UpstreamClients] = None,
+        warmer: Optional[QueryWarmer] = None
     ):
         self.kb = knowledge_base
+        # Por padrão usa os mesmos pools de conexão do vector store
+        self.clients = clients if clients is not None else vector_store.clients
         self.vector_store = vector_store
-        self.llm = ChatOpenAI(model_name=model_name, temperature=0.7) # Ajuste temp se necessário
-        self.memory = ConversationBufferWindowMemory(k=5, return_messages=True, memory_key="chat_history", input_key="input")
+        self.model_name = model_name
+        # Por padrão compartilha o cache do vector store; CACHE_RESPONSE_TTL=0 desativa o cache de respostas
+        self.cache = cache if cache is not None else vector_store.cache
+        self.response_cache_ttl = float(os.getenv("CACHE_RESPONSE_TTL", "3600"))
+        # Frequência das consultas, para o aquecimento dos caches no startup (opcional)
+        self.warmer = warmer
+        # stream_usage: o último chunk do stream traz o uso real de tokens (inclusive os em cache)
+        self.llm = self._chat_model(model_name=model_name, temperature=0.7, stream_usage=True) # Ajuste temp se necessário
+        # Respostas em cache ficam inválidas quando o prompt de sistema muda
+        self._prompt_fingerprint = hash_key(SYSTEM_PROMPT)
+        self.memory = self._create_memory()
+        self._background_tasks = set()
+        self.sse = SSEEncoder()
         
         # Inicializa as chains específicas
         self.concept_explanation_chain = self._create_concept_chain()
@@ -43,147 +55,104 @@ class JungianAnalyst:
         # --- Inicializar a nova chain conversacional ---
         self.conversational_chain = self._create_conversational_chain()
     
+    def _chat_model(self, **kwargs: Any) -> ChatOpenAI:
+        return self.clients.chat_model(**kwargs) if self.clients else ChatOpenAI(**kwargs)
+
+    def _create_memory(self):
+        """Cria a memória conforme MEMORY_MODE: 'window' (padrão) ou 'summary'."""
+        if os.getenv("MEMORY_MODE", "window") == "summary":
+            summary_llm = self._chat_model(
+                model_name=os.getenv("SUMMARY_MODEL", "gpt-4o-mini"),
+                temperature=0,
+                max_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "400"))
+            )
+            return RollingSummaryMemory(summary_llm, k=5, memory_key="chat_history", input_key="input")
+        return ConversationBufferWindowMemory(k=5, return_messages=True, memory_key="chat_history", input_key="input")
+
+    def _save_turn(self, user_input: str, output: str) -> None:
+        """Salva o turno na memória e agenda a sumarização em background, se necessária."""
+        self.memory.save_context({"input": user_input}, {"output": output})
+        if getattr(self.memory, "needs_summary", False):
+            task = asyncio.create_task(self._summarize_memory())
+            # Mantém referência até o fim para a task não ser coletada
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    async def _summarize_memory(self) -> None:
+        try:
+            await self.memory.asummarize()
+        except Exception as e:
+            logger.error(f"Erro ao resumir a conversa: {str(e)}", exc_info=True)
+
+    async def _find_relevant_concepts(self, text: str, k: int = 3) -> List[str]:
+        """Conceitos relevantes: marcações dos chunks recuperados + marcação da própria consulta.
+
+        O embedding da consulta é calculado uma vez e reaproveitado na busca e
+        no ConceptTagger (produto matriz-vetor local, sem chamada extra).
+        """
+        query_embedding = await self.vector_store.embed_query(text)
+        similar_docs = await self.vector_store.similarity_search_by_vector(query_embedding, k=k)
+        names = []
+        for doc in similar_docs:
+            names.append(doc.metadata.get('concept'))
+            names.extend(doc.metadata.get('concepts') or [])
+        tagger = self.vector_store.concept_tagger
+        if tagger is not None:
+            # Conceitos adicionados à base depois do startup entram na matriz aqui, sem bloquear o event loop
+            await tagger.arefresh()
+            names.extend(tagger.tag_one(query_embedding))
+        return list(dict.fromkeys(name for name in names if name))
+
+    def _lookup_concept(self, name: str):
+        """Busca um conceito ou, se não houver, um arquétipo com esse nome."""
+        return self.kb.get_concept(name) or self.kb.get_archetype(name)
+
+    def _chat_history(self, input_data: Dict[str, Any]) -> Any:
+        """Carrega o histórico da memória para as chains (etapa 'memory_load')."""
+        with stage("memory_load"):
+            return self.memory.load_memory_variables(input_data)["chat_history"]
+
+    def _response_cache_key(self, chain_name: str, chain_input: Dict[str, Any]) -> Optional[str]:
+        """Chave do cache de respostas: modelo, prompt, chain, entradas e histórico atual da conversa."""
+        if self.cache is None or self.response_cache_ttl <= 0:
+            return None
+        history = self.memory.load_memory_variables({"input": chain_input.get("input", "")})["chat_history"]
+        if isinstance(history, list):
+            history = [(message.type, message.content) for message in history]
+        return hash_key(self.model_name, self._prompt_fingerprint, chain_name, sorted(chain_input.items()), history)
+
     def _load_memory(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         memory_variables = self.memory.load_memory_variables({"input": input_data.get("input", "")})
         input_data.update(memory_variables)
         return input_data
 
-    def _create_concept_chain(self):
-        """Cria uma chain para explicar conceitos junguianos usando LCEL."""
-        template = """
-        Como um analista junguiano experiente, explique o seguinte conceito:
-        
-        Conceito: {concept_name}
-        
-        Contexto adicional do banco de dados:
-        {context}
-        
-        Por favor, forneça:
-        1. Uma explicação clara e acessível
-        2. Exemplos práticos do conceito
-        3. Como ele se relaciona com outros conceitos junguianos
-        4. Sua relevância para o desenvolvimento pessoal
-        
-        Histórico da conversa:
-        {chat_history}
-        
-        Sua explicação:
-        """
-        
-        prompt = PromptTemplate(
-            input_variables=["concept_name", "context", "chat_history", "input"],
-            template=template
-        )
-        
-        chain = (
+    def _create_chain(self, prompt: ChatPromptTemplate):
+        """Monta a chain LCEL: histórico da memória -> prompt compilado -> LLM -> texto."""
+        return (
             RunnablePassthrough.assign(
-                chat_history=lambda x: self.memory.load_memory_variables(x)["chat_history"]
+                # Carrega chat_history da memória. A chave "input" é necessária pela memória.
+                chat_history=self._chat_history
             )
             | prompt
             | self.llm
             | StrOutputParser()
         )
-        return chain
+
+    def _create_concept_chain(self):
+        """Cria uma chain para explicar conceitos junguianos usando LCEL."""
+        return self._create_chain(CONCEPT_PROMPT)
     
     def _create_archetype_chain(self):
         """Cria uma chain para análise de arquétipos usando LCEL."""
-        template = """
-        Como um analista junguiano experiente, analise o seguinte arquétipo:
-        
-        Arquétipo: {archetype_name}
-        
-        Manifestações conhecidas:
-        {manifestations}
-        
-        Símbolos associados:
-        {symbols}
-        
-        Por favor, forneça:
-        1. Uma descrição do arquétipo e seu significado
-        2. Como ele se manifesta na vida cotidiana
-        3. Seu papel no processo de individuação
-        4. Formas de trabalhar construtivamente com este arquétipo
-        
-        Histórico da conversa:
-        {chat_history}
-        
-        Sua análise:
-        """
-        
-        prompt = PromptTemplate(
-            input_variables=["archetype_name", "manifestations", "symbols", "chat_history", "input"],
-            template=template
-        )
-        
-        chain = (
-            RunnablePassthrough.assign(
-                 chat_history=lambda x: self.memory.load_memory_variables(x)["chat_history"]
-            )
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-        return chain
+        return self._create_chain(ARCHETYPE_PROMPT)
     
     def _create_therapeutic_chain(self):
         """Cria uma chain para orientação terapêutica usando LCEL."""
-        template = """
-        Como um analista junguiano experiente, forneça orientação terapêutica:
-        
-        Situação: {situation}
-        
-        Conceitos relevantes:
-        {relevant_concepts}
-        
-        Técnicas disponíveis:
-        {available_techniques}
-        
-        Por favor, forneça:
-        1. Uma análise da situação sob a perspectiva junguiana
-        2. Sugestões de técnicas terapêuticas apropriadas
-        3. Possíveis desafios e como abordá-los
-        4. Objetivos terapêuticos recomendados
-        
-        Histórico da conversa:
-        {chat_history}
-        
-        Sua orientação:
-        """
-        
-        prompt = PromptTemplate(
-            input_variables=["situation", "relevant_concepts", "available_techniques", "chat_history", "input"],
-            template=template
-        )
-        
-        chain = (
-            RunnablePassthrough.assign(
-                 chat_history=lambda x: self.memory.load_memory_variables(x)["chat_history"]
-            )
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-        return chain
+        return self._create_chain(THERAPEUTIC_PROMPT)
     
-    # --- Adicionar método para criar a chain conversacional ---
     def _create_conversational_chain(self):
         """Cria uma chain para respostas conversacionais como Jung."""
-        prompt = PromptTemplate(
-            input_variables=["user_input", "chat_history", "input"], # Adiciona "input" para memória
-            template=SYSTEM_PROMPT_CONVERSATIONAL
-        )
-
-        chain = (
-            RunnablePassthrough.assign(
-                # Carrega chat_history da memória. A chave "input" é necessária pela memória.
-                chat_history=lambda x: self.memory.load_memory_variables(x)["chat_history"]
-            )
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-        return chain
-    # --- Fim do novo método ---
+        return self._create_chain(CONVERSATIONAL_PROMPT)
     
     async def explain_concept(self, concept_name: str, user_input: str) -> str:
         """Explica um conceito junguiano."""
@@ -203,7 +172,7 @@ class JungianAnalyst:
             "context": context,
             "input": user_input
         })
-        self.memory.save_context({"input": user_input}, {"output": response})
+        self._save_turn(user_input, response)
         return response
     
     async def analyze_archetype(self, archetype_name: str, user_input: str) -> str:
@@ -218,83 +187,140 @@ class JungianAnalyst:
             "symbols": "\n".join(archetype.symbols),
             "input": user_input
         })
-        self.memory.save_context({"input": user_input}, {"output": response})
+        self._save_turn(user_input, response)
         return response
     
-    async def generate_response_stream(self, user_input: str) -> AsyncGenerator[str, None]:
-        """Gera uma resposta em streaming, escolhendo a chain apropriada."""
-        full_response_text = ""
+    async def generate_response_stream(
+        self,
+        user_input: str,
+        trace_headers: Optional[Dict[str, str]] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncGenerator[str, None]:
+        """Gera uma resposta em streaming, escolhendo a chain apropriada.
+
+        Se ``is_disconnected`` for informado, a geração no upstream é cancelada
+        assim que o cliente desconecta, e o turno abortado não vai para a memória.
+        """
+        response_parts: List[str] = [] # Buffer da resposta; juntado uma única vez no final
         references = [] # Placeholder for references, logic TBD
         concepts_metadata = [] # To store metadata for final event
 
-        # --- Lógica para decidir qual chain usar ---
-        is_simple_input = False
-        normalized_input = user_input.lower().strip()
-        greetings = ["olá", "oi", "tudo bem", "bom dia", "boa tarde", "boa noite"]
-        # Critério: menos de 8 palavras OU contém saudação
-        if len(normalized_input.split()) < 8 or any(greet in normalized_input for greet in greetings):
-            is_simple_input = True
-        # --- Fim da lógica de decisão ---
+        with request_span("chat.request", trace_headers):
+            # --- Lógica para decidir qual chain usar ---
+            with stage("routing"):
+                is_simple_input = False
+                normalized_input = user_input.lower().strip()
+                greetings = ["olá", "oi", "tudo bem", "bom dia", "boa tarde", "boa noite"]
+                # Critério: menos de 8 palavras OU contém saudação
+                if len(normalized_input.split()) < 8 or any(greet in normalized_input for greet in greetings):
+                    is_simple_input = True
+            # --- Fim da lógica de decisão ---
 
-        try:
-            if is_simple_input:
-                # --- Usar Chain Conversacional --- 
-                chain_to_use = self.conversational_chain
-                chain_input = {"user_input": user_input, "input": user_input} # Input simples para chain conv.
-                
-                # Para inputs simples, não buscamos concepts/references inicialmente
-                relevant_concepts_list = [] 
-                concepts_info = []
+            try:
+                if is_simple_input:
+                    # --- Usar Chain Conversacional --- 
+                    chain_to_use = self.conversational_chain
+                    chain_name = "conversational"
+                    chain_input = {"user_input": user_input, "input": user_input} # Input simples para chain conv.
+                    
+                    # Para inputs simples, não buscamos concepts/references inicialmente
+                    relevant_concepts_list = [] 
+                    concepts_info = []
 
-            else:
-                # --- Usar Chain Terapêutica (como antes) ---
-                chain_to_use = self.therapeutic_guidance_chain
-                # 1. Buscar contexto inicial (conceitos relevantes)
-                similar_docs = self.vector_store.similarity_search(user_input, k=3)
-                relevant_concepts_list = [doc.metadata.get('concept') for doc in similar_docs if doc.metadata.get('concept')]
-                concepts_info = []
-                for concept_name in relevant_concepts_list or []:
-                    concept = self.kb.get_concept(concept_name)
-                    if concept:
-                        concepts_info.append(f"{concept_name}: {concept.description}")
-                        concepts_metadata.append({
-                            "name": concept_name,
-                            "description": concept.description[:150] + "..."
-                        })
-                techniques = self.kb.get_therapeutic_techniques()
-                # 2. Preparar input para a chain terapêutica
-                chain_input = {
-                    "situation": user_input,
-                    "relevant_concepts": "\n".join(concepts_info),
-                    "available_techniques": "\n".join(techniques),
-                    "input": user_input
-                }
-            # --- Fim da seleção da Chain ---
+                else:
+                    # --- Usar Chain Terapêutica (como antes) ---
+                    chain_to_use = self.therapeutic_guidance_chain
+                    chain_name = "therapeutic"
+                    if self.warmer is not None:
+                        self.warmer.record(user_input, k=3)
+                    # 1. Buscar contexto inicial (conceitos relevantes)
+                    relevant_concepts_list = await self._find_relevant_concepts(user_input, k=3)
+                    with stage("knowledge_lookup"):
+                        concepts_info = []
+                        for concept_name in relevant_concepts_list or []:
+                            concept = self._lookup_concept(concept_name)
+                            if concept:
+                                concepts_info.append(f"{concept_name}: {concept.description}")
+                                concepts_metadata.append({
+                                    "name": concept_name,
+                                    "description": concept.description[:150] + "..."
+                                })
+                        techniques = self.kb.get_therapeutic_techniques()
+                    # 2. Preparar input para a chain terapêutica
+                    chain_input = {
+                        "situation": user_input,
+                        "relevant_concepts": "\n".join(concepts_info),
+                        "available_techniques": "\n".join(techniques),
+                        "input": user_input
+                    }
+                # --- Fim da seleção da Chain ---
 
-            # 3. Iterar sobre o stream da LLM usando a chain selecionada
-            async for chunk in chain_to_use.astream(chain_input):
-                if chunk:
-                    full_response_text += chunk
-                    sse_event = f"data: {json.dumps({'text': chunk})}\n\n"
-                    yield sse_event
+                # 3. Resposta em cache (mesma chain, entradas e histórico) ou stream da LLM
+                #    Tokens são agrupados pelo TokenCoalescer (o primeiro sai imediatamente)
+                stream_start = time.perf_counter()
+                cache_key = self._response_cache_key(chain_name, chain_input)
+                found, cached_response = False, None
+                usage = None
+                if cache_key is not None:
+                    found, cached_response = await self.cache.get("responses", cache_key)
+                if found:
+                    observe_stage("time_to_first_token", time.perf_counter() - stream_start)
+                    response_parts.append(cached_response)
+                    yield self.sse.text(cached_response)
+                else:
+                    usage = TokenUsageCallback(self.model_name)
+                    coalescer = TokenCoalescer()
+                    first_token = True
+                    llm_stream = chain_to_use.astream(chain_input, config={"callbacks": [usage]})
+                    if is_disconnected is not None:
+                        llm_stream = cancel_on_disconnect(llm_stream, is_disconnected)
+                    with stage("stream_total"):
+                        async for chunk in llm_stream:
+                            if chunk:
+                                if first_token:
+                                    observe_stage("time_to_first_token", time.perf_counter() - stream_start)
+                                    first_token = False
+                                response_parts.append(chunk)
+                                text = coalescer.push(chunk)
+                                if text:
+                                    yield self.sse.text(text)
+                        text = coalescer.flush()
+                        if text:
+                            yield self.sse.text(text)
+                    usage.record()
+                full_response_text = "".join(response_parts)
+                if cache_key is not None and not found and full_response_text:
+                    await self.cache.set("responses", cache_key, full_response_text, ttl=self.response_cache_ttl)
 
-            # 4. Após o stream, fazer yield do evento de metadados
-            #    Se foi input simples, os metadados estarão vazios.
-            metadata = {
-                "concepts": concepts_metadata, # Será vazio se is_simple_input for True
-                "references": references
-            }
-            yield f"event: metadata\ndata: {json.dumps(metadata)}\n\n"
+                # 4. Após o stream, fazer yield do evento de metadados
+                #    Se foi input simples, os metadados estarão vazios.
+                metadata = {
+                    "concepts": concepts_metadata, # Será vazio se is_simple_input for True
+                    "references": references
+                }
+                if usage is not None:
+                    metadata["usage"] = usage.as_dict()
+                yield self.sse.event("metadata", metadata)
 
-            # 5. Salvar contexto na memória APÓS stream completo
-            # Usamos user_input e a resposta completa (independente da chain)
-            self.memory.save_context({"input": user_input}, {"output": full_response_text})
+                # 5. Salvar contexto na memória APÓS stream completo
+                # Usamos user_input e a resposta completa (independente da chain)
+                with stage("memory_save"):
+                    self._save_turn(user_input, full_response_text)
 
-        except Exception as e:
-            # Em caso de erro, envia um evento de erro SSE
-            error_message = f"Erro durante o processamento: {str(e)}"
-            print(f"ERROR in generate_response_stream: {error_message}") # Log no servidor
-            yield f"event: error\ndata: {json.dumps({'error': error_message})}\n\n"
+            except ClientDisconnected:
+                # Cliente saiu: o upstream já foi cancelado e o turno não é salvo
+                record_cancellation("client_disconnected")
+                logger.info(f"Cliente desconectou; geração cancelada após {len(response_parts)} tokens")
+            except (asyncio.CancelledError, GeneratorExit):
+                # O servidor cancelou o stream (ex.: desconexão detectada pelo Starlette)
+                record_cancellation("server_cancelled")
+                logger.info(f"Stream cancelado após {len(response_parts)} tokens; turno não salvo na memória")
+                raise
+            except Exception as e:
+                # Em caso de erro, envia um evento de erro SSE
+                error_message = f"Erro durante o processamento: {str(e)}"
+                logger.error(f"Erro em generate_response_stream: {error_message}", exc_info=True)
+                yield self.sse.event("error", {"error": error_message})
 
     async def get_therapeutic_guidance(
         self,
@@ -304,12 +330,11 @@ class JungianAnalyst:
     ) -> str:
         """Fornece orientação terapêutica baseada na psicologia junguiana."""
         if relevant_concepts is None:
-            similar_docs = await self.vector_store.similarity_search(situation)
-            relevant_concepts = [doc.metadata.get('concept') for doc in similar_docs if doc.metadata.get('concept')]
+            relevant_concepts = await self._find_relevant_concepts(situation)
         
         concepts_info = []
         for concept_name in relevant_concepts or []:
-            concept = self.kb.get_concept(concept_name)
+            concept = self._lookup_concept(concept_name)
             if concept:
                 concepts_info.append(f"{concept_name}: {concept.description}")
         
@@ -321,5 +346,5 @@ class JungianAnalyst:
             "available_techniques": "\n".join(techniques),
             "input": user_input
         })
-        self.memory.save_context({"input": user_input}, {"output": response})
+        self._save_turn(user_input, response)
         return response 
\ No newline at end of file
@@ -0,0 +1,133 @@
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import os
+import logging
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from .telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Você mantém um resumo conciso de uma conversa entre um interlocutor e C.G. Jung.
+Atualize o resumo existente incorporando os novos turnos. Preserve os temas, símbolos e
+conceitos junguianos discutidos. Não registre nomes, dados pessoais nem detalhes que identifiquem
+o interlocutor.
+Responda apenas com o resumo atualizado, em português, em no máximo {max_words} palavras.
+
+Resumo atual:
+{summary}
+
+Novos turnos:
+{turns}
+
+Resumo atualizado:"""
+
+class RollingSummaryMemory:
+    """Memória com os últimos ``k`` turnos literais e um resumo contínuo dos anteriores.
+
+    Compatível com o uso de ``ConversationBufferWindowMemory`` no analista
+    (``load_memory_variables`` / ``save_context``). Turnos que saem da janela
+    ficam pendentes até ``asummarize()`` - executado em background depois do
+    stream - dobrá-los no resumo com um modelo barato. Assim o histórico
+    enviado ao prompt fica limitado: resumo + no máximo ``k`` turnos pendentes
+    + ``k`` turnos recentes, mesmo que a sumarização atrase ou falhe.
+
+    Se a sumarização falhar repetidamente, a fila de pendentes é limitada a
+    ``max_pending`` turnos (os mais antigos são descartados) e cada turno entra
+    no prompt de sumarização com no máximo ``max_turn_chars`` caracteres, de
+    modo que memória e prompt continuam limitados.
+
+    Como a janela literal, a memória é uma só por analista (não por
+    conversa): o resumo guarda apenas temas e conceitos, sem dados pessoais.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        k: int = 5,
+        max_summary_words: int = 250,
+        memory_key: str = "chat_history",
+        input_key: str = "input",
+        return_messages: bool = True,
+        max_pending: Optional[int] = None,
+        max_turn_chars: Optional[int] = None
+    ):
+        self.llm = llm
+        self.k = k
+        self.max_summary_words = max_summary_words
+        self.memory_key = memory_key
+        self.input_key = input_key
+        self.return_messages = return_messages
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        self.pending: List[Tuple[str, str]] = []
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("SUMMARY_MAX_PENDING_TURNS", "20"))
+        self.max_turn_chars = max_turn_chars if max_turn_chars is not None else int(os.getenv("SUMMARY_MAX_TURN_CHARS", "2000"))
+        # Total de turnos pendentes descartados (para asummarize saber o que já saiu da fila)
+        self.dropped = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def needs_summary(self) -> bool:
+        return bool(self.pending)
+
+    def _messages(self) -> List[BaseMessage]:
+        messages: List[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Resumo da conversa até aqui: {self.summary}"))
+        for user_input, output in self.pending[-self.k:] + self.turns:
+            messages.append(HumanMessage(content=user_input))
+            messages.append(AIMessage(content=output))
+        return messages
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self._messages()
+        if self.return_messages:
+            return {self.memory_key: messages}
+        history = "\n".join(
+            f"{'Interlocutor' if isinstance(m, HumanMessage) else 'Jung' if isinstance(m, AIMessage) else 'Resumo'}: {m.content}"
+            for m in messages
+        )
+        return {self.memory_key: history}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        self.turns.append((inputs.get(self.input_key, ""), outputs.get("output", "")))
+        if len(self.turns) > self.k:
+            self.pending.extend(self.turns[:-self.k])
+            self.turns = self.turns[-self.k:]
+        overflow = len(self.pending) - self.max_pending
+        if overflow > 0:
+            # Sumarização falhando há vários turnos: descarta os mais antigos
+            self.pending = self.pending[overflow:]
+            self.dropped += overflow
+            logger.warning(f"{overflow} turno(s) pendente(s) descartado(s) sem entrar no resumo")
+
+    def _clip(self, text: str) -> str:
+        return text if len(text) <= self.max_turn_chars else text[:self.max_turn_chars] + "…"
+
+    async def asummarize(self) -> None:
+        """Incorpora os turnos pendentes ao resumo usando o modelo de sumarização."""
+        async with self._lock:
+            batch = list(self.pending)
+            if not batch:
+                return
+            dropped = self.dropped
+            turns = "\n".join(f"Interlocutor: {self._clip(u)}\nJung: {self._clip(o)}" for u, o in batch)
+            prompt = SUMMARY_PROMPT.format(
+                max_words=self.max_summary_words,
+                summary=self.summary or "(vazio)",
+                turns=turns
+            )
+            with stage("memory_summarize"):
+                response = await self.llm.ainvoke(prompt)
+            self.summary = str(response.content).strip()
+            # Novos turnos podem ter sido adicionados (e antigos descartados) durante a chamada
+            consumed = max(len(batch) - (self.dropped - dropped), 0)
+            self.pending = self.pending[consumed:]
+            logger.info(f"Resumo da conversa atualizado com {len(batch)} turnos")
+
+    def clear(self) -> None:
+        self.summary = ""
+        self.turns = []
+        self.pending = []
+        self.dropped = 0
@@ -0,0 +1,589 @@
+from typing import List, Dict, Optional, Sequence, Tuple
+import io
+import json
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tamanho do temporário em float32 por bloco de linhas nas varreduras (cabe no cache L2)
+SCAN_BLOCK_BYTES = 1 << 18
+# Linhas codificadas por vez ao treinar/recodificar o índice
+ENCODE_BLOCK_ROWS = 4096
+# Amostra máxima usada por train() sem argumentos
+MAX_TRAIN_SIZE = 16384
+
+def _block_rows(columns: int) -> int:
+    return max(1, SCAN_BLOCK_BYTES // (4 * max(columns, 1)))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normaliza vetores (linhas) para norma unitária."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class MatryoshkaReducer:
+    """Reduz dimensões truncando o embedding e renormalizando (estilo Matryoshka)."""
+
+    kind = "matryoshka"
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def fit(self, vectors: np.ndarray) -> "MatryoshkaReducer":
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return _normalize(np.asarray(vectors, dtype=np.float32)[..., :self.dimensions])
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        pass
+
+class PCAReducer:
+    """Reduz dimensões com um PCA ajustado sobre os vetores da ingestão."""
+
+    kind = "pca"
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    def fit(self, vectors: np.ndarray) -> "PCAReducer":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mean = vectors.mean(axis=0)
+        # SVD da matriz centralizada; as linhas de vt são as componentes principais
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        if len(vt) < self.dimensions:
+            raise ValueError(
+                f"PCA com {self.dimensions} dimensões requer ao menos {self.dimensions} vetores de treino"
+            )
+        self.components = vt[:self.dimensions].astype(np.float32)
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        if self.components is None:
+            raise ValueError("PCA não ajustado. Chame fit() antes de transform().")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return _normalize((vectors - self.mean) @ self.components.T)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"mean": self.mean, "components": self.components}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.mean = state["mean"]
+        self.components = state["components"]
+
+class ScalarQuantizer:
+    """Quantização escalar int8 por dimensão (min/max ajustados na ingestão)."""
+
+    kind = "int8"
+
+    def __init__(self):
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    def fit(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = low.astype(np.float32)
+        self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Produto interno assimétrico: query em float32, base em int8.
+
+        Os códigos são convertidos para float32 em blocos de linhas num buffer
+        reaproveitado, sem nunca materializar a matriz n x d em float32.
+        """
+        weights = (query * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        rows = _block_rows(codes.shape[1])
+        buffer = np.empty((min(rows, len(codes)), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), rows):
+            block = codes[start:start + rows]
+            converted = buffer[:len(block)]
+            converted[...] = block
+            np.dot(converted, weights, out=out[start:start + len(block)])
+        out += float(query @ self.offset)
+        return out
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"offset": self.offset, "scale": self.scale}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.offset = state["offset"]
+        self.scale = state["scale"]
+
+class ProductQuantizer:
+    """Product quantization: ``subspaces`` códigos de 8 bits por vetor."""
+
+    kind = "pq"
+
+    def __init__(self, subspaces: int = 96, centroids: int = 256, iterations: int = 15, seed: int = 0):
+        if centroids > 256:
+            raise ValueError("ProductQuantizer suporta no máximo 256 centróides por subespaço")
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dim = vectors.shape
+        if dim % self.subspaces:
+            raise ValueError(f"Dimensão {dim} não é divisível por {self.subspaces} subespaços")
+        return vectors.reshape(n, self.subspaces, dim // self.subspaces)
+
+    def fit(self, vectors: np.ndarray) -> "ProductQuantizer":
+        rng = np.random.default_rng(self.seed)
+        parts = self._split(vectors)
+        k = min(self.centroids, len(vectors))
+        codebooks = []
+        for m in range(self.subspaces):
+            data = parts[:, m, :]
+            centers = data[rng.choice(len(data), size=k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(data, centers)
+                counts = np.bincount(assignment, minlength=k)
+                sums = np.zeros_like(centers)
+                np.add.at(sums, assignment, data)
+                filled = counts > 0
+                centers[filled] = sums[filled] / counts[filled, None]
+            codebooks.append(centers)
+        self.codebooks = np.stack(codebooks).astype(np.float32)
+        return self
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        distances = (
+            (data ** 2).sum(axis=1, keepdims=True)
+            - 2 * data @ centers.T
+            + (centers ** 2).sum(axis=1)
+        )
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(vectors)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for m in range(self.subspaces):
+            codes[:, m] = self._nearest(parts[:, m, :], self.codebooks[m])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = self.codebooks[np.arange(self.subspaces), codes]
+        return parts.reshape(len(codes), -1)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Asymmetric distance computation com tabelas de lookup por subespaço (em blocos de linhas)."""
+        query_parts = query.reshape(self.subspaces, -1)
+        tables = np.einsum("md,mkd->mk", query_parts, self.codebooks)
+        subspaces = np.arange(self.subspaces)
+        out = np.empty(len(codes), dtype=np.float32)
+        rows = _block_rows(self.subspaces)
+        for start in range(0, len(codes), rows):
+            block = codes[start:start + rows]
+            out[start:start + len(block)] = tables[subspaces, block].sum(axis=1)
+        return out
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.codebooks = state["codebooks"]
+        self.subspaces = self.codebooks.shape[0]
+        self.centroids = self.codebooks.shape[1]
+
+REDUCERS = {"matryoshka": MatryoshkaReducer, "pca": PCAReducer}
+
+def _build_quantizer(kind: Optional[str], pq_subspaces: int):
+    if kind in (None, "", "none", "float32"):
+        return None
+    if kind == "int8":
+        return ScalarQuantizer()
+    if kind == "pq":
+        return ProductQuantizer(subspaces=pq_subspaces)
+    raise ValueError(f"Quantização desconhecida: {kind}")
+
+class QuantizedVectorIndex:
+    """Índice vetorial local com redução de dimensão, quantização e rescoring exato.
+
+    A busca é feita em duas etapas: os vetores comprimidos (em RAM) geram uma
+    shortlist de ``k * rescore_factor`` candidatos, que são reordenados pelo
+    cosseno exato contra os vetores em precisão total. Com um diretório
+    (``path``), os vetores em precisão total ficam só em disco, em
+    ``full.npy`` aberto como ``np.memmap``: ``add()`` grava as linhas novas no
+    fim do arquivo e só as páginas da shortlist são lidas na busca. Sem
+    diretório, eles ficam em RAM. Um único processo deve gravar no índice
+    (ingestão ou importação de snapshot); os workers só leem.
+
+    PCA e quantizadores só são treinados com uma amostra representativa: até
+    ``train()`` ser chamado ou o índice acumular ``min_train_size`` vetores, os
+    vetores ficam apenas em precisão total e a busca é exata. Sem redução nem
+    quantização, a busca é sempre exata e não há cópia comprimida.
+    """
+
+    def __init__(
+        self,
+        reduction: Optional[str] = None,
+        dimensions: Optional[int] = None,
+        quantization: Optional[str] = "int8",
+        pq_subspaces: int = 96,
+        rescore_factor: int = 4,
+        min_train_size: Optional[int] = None
+    ):
+        if reduction and reduction not in REDUCERS:
+            raise ValueError(f"Redução de dimensão desconhecida: {reduction}")
+        if reduction and not dimensions:
+            raise ValueError("Redução de dimensão requer 'dimensions'")
+        self.reduction = reduction
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.pq_subspaces = pq_subspaces
+        self.rescore_factor = rescore_factor
+
+        self.reducer = REDUCERS[reduction](dimensions) if reduction else None
+        self.quantizer = _build_quantizer(quantization, pq_subspaces)
+        if min_train_size is None:
+            min_train_size = int(os.getenv("LOCAL_INDEX_MIN_TRAIN_SIZE", "2048"))
+        if reduction == "pca":
+            min_train_size = max(min_train_size, dimensions)
+        if isinstance(self.quantizer, ProductQuantizer):
+            min_train_size = max(min_train_size, self.quantizer.centroids)
+        # Truncamento Matryoshka sem quantização não tem o que treinar
+        needs_training = reduction == "pca" or self.quantizer is not None
+        self.min_train_size = min_train_size if needs_training else 0
+        self.trained = not needs_training
+        # Sem redução nem quantização a busca usa direto os vetores em precisão total
+        self.exact = self.reducer is None and self.quantizer is None
+        # Diretório de persistência (definido por load_or_create_index)
+        self.path: Optional[str] = None
+
+        self.ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self.codes: Optional[np.ndarray] = None
+        self.full: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _reduce(self, vectors: np.ndarray) -> np.ndarray:
+        return self.reducer.transform(vectors) if self.reducer else vectors
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        reduced = self._reduce(vectors)
+        return self.quantizer.encode(reduced) if self.quantizer else reduced.astype(np.float32)
+
+    def _encode_full(self) -> np.ndarray:
+        """Codifica os vetores em precisão total em blocos (sem copiar a matriz para a RAM)."""
+        return np.concatenate([
+            self._encode(np.asarray(self.full[start:start + ENCODE_BLOCK_ROWS]))
+            for start in range(0, len(self.full), ENCODE_BLOCK_ROWS)
+        ])
+
+    def _training_sample(self) -> np.ndarray:
+        if self.full is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if len(self.full) <= MAX_TRAIN_SIZE:
+            return np.asarray(self.full)
+        # Linhas ordenadas: leitura sequencial do memmap
+        rows = np.sort(np.random.default_rng(0).choice(len(self.full), size=MAX_TRAIN_SIZE, replace=False))
+        return np.asarray(self.full[rows])
+
+    def train(self, vectors: Optional[Sequence[Sequence[float]]] = None) -> None:
+        """Ajusta PCA e quantizador e codifica os vetores já adicionados.
+
+        Sem argumentos, treina com os vetores já acumulados no índice (no máximo
+        ``MAX_TRAIN_SIZE``, amostrados). Para índices grandes, chame antes do
+        primeiro add() com uma amostra representativa do corpus.
+        """
+        if vectors is None:
+            vectors = self._training_sample()
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if len(vectors) == 0:
+            raise ValueError("train() requer ao menos um vetor")
+        if self.reducer:
+            self.reducer.fit(vectors)
+        if self.quantizer:
+            self.quantizer.fit(self._reduce(vectors))
+        self.trained = True
+        if self.full is not None and not self.exact:
+            self.codes = self._encode_full()
+        logger.info(f"Índice local treinado com {len(vectors)} vetores")
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Adiciona (ou substitui) vetores no índice.
+
+        Antes do treino os vetores ficam só em precisão total; ao atingir
+        ``min_train_size`` o índice é treinado com todos eles e codificado.
+        """
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        codes = self._encode(vectors) if self.trained and not self.exact else None
+
+        replaced, new_rows = [], []
+        for row, vector_id in enumerate(ids):
+            position = self._positions.get(vector_id)
+            if position is None:
+                new_rows.append(row)
+            else:
+                replaced.append((position, row))
+
+        if replaced:
+            positions = [position for position, _ in replaced]
+            rows = [row for _, row in replaced]
+            if codes is not None:
+                self.codes[positions] = codes[rows]
+            self._write_full_rows(positions, vectors[rows])
+
+        if new_rows:
+            start = len(self.ids)
+            for offset, row in enumerate(new_rows):
+                self.ids.append(ids[row])
+                self._positions[ids[row]] = start + offset
+            if codes is not None:
+                self.codes = codes[new_rows] if self.codes is None else np.concatenate([self.codes, codes[new_rows]])
+            self._append_full(vectors[new_rows])
+
+        if not self.trained and len(self.ids) >= self.min_train_size:
+            self.train()
+
+    # --- Vetores em precisão total (RAM ou full.npy em disco) ---
+
+    def _full_file(self) -> Optional[str]:
+        return os.path.join(self.path, "full.npy") if self.path else None
+
+    def _on_disk(self, target: Optional[str]) -> bool:
+        """Se ``full`` é o memmap do próprio ``target``."""
+        return (
+            target is not None
+            and isinstance(self.full, np.memmap)
+            and os.path.exists(target)
+            and os.path.samefile(self.full.filename, target)
+        )
+
+    def _write_full_file(self, target: str, blocks) -> None:
+        """Grava ``full.npy`` num temporário e renomeia (quem lê o arquivo antigo não é afetado)."""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        blocks = list(blocks)
+        rows = sum(len(block) for block in blocks)
+        columns = blocks[0].shape[1]
+        temporary = f"{target}.tmp"
+        out = np.lib.format.open_memmap(temporary, mode="w+", dtype=np.float32, shape=(rows, columns))
+        position = 0
+        for block in blocks:
+            for start in range(0, len(block), ENCODE_BLOCK_ROWS):
+                part = np.asarray(block[start:start + ENCODE_BLOCK_ROWS])
+                out[position:position + len(part)] = part
+                position += len(part)
+        out.flush()
+        del out
+        os.replace(temporary, target)
+
+    def _append_full(self, vectors: np.ndarray) -> None:
+        target = self._full_file()
+        if target is None:
+            self.full = vectors if self.full is None else np.concatenate([self.full, vectors])
+            return
+        if not self._on_disk(target):
+            # Primeira gravação neste diretório (ou vetores ainda em RAM)
+            self._write_full_file(target, [vectors] if self.full is None else [self.full, vectors])
+        else:
+            rows = len(self.full)
+            with open(target, "r+b") as f:
+                version = np.lib.format.read_magic(f)
+                read_header, write_header = (
+                    (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0)
+                    if version == (1, 0) else
+                    (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0)
+                )
+                _, _, dtype = read_header(f)
+                offset = f.tell()
+                header = io.BytesIO()
+                write_header(header, {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (rows + len(vectors), vectors.shape[1]),
+                })
+                if len(header.getvalue()) != offset:
+                    # Cabeçalho sem folga para o novo shape (arquivo de outra versão do numpy)
+                    f.close()
+                    self._write_full_file(target, [self.full, vectors])
+                else:
+                    # Linhas antes do cabeçalho: uma interrupção no meio não invalida o arquivo
+                    f.seek(offset + rows * vectors.shape[1] * dtype.itemsize)
+                    f.write(vectors.astype(dtype, copy=False).tobytes())
+                    f.truncate()
+                    f.seek(0)
+                    f.write(header.getvalue())
+        self.full = np.load(target, mmap_mode="r")
+
+    def _write_full_rows(self, positions: List[int], vectors: np.ndarray) -> None:
+        target = self._full_file()
+        if not self._on_disk(target):
+            if isinstance(self.full, np.memmap):
+                # memmap de outro diretório: passa a gravar no diretório do índice (ou em RAM)
+                self._append_full(np.empty((0, vectors.shape[1]), dtype=np.float32))
+            if not isinstance(self.full, np.memmap):
+                self.full[positions] = vectors
+                return
+        writable = np.lib.format.open_memmap(target, mode="r+")
+        writable[positions] = vectors
+        writable.flush()
+        del writable
+
+    def search(self, query: Sequence[float], k: int = 3, rescore: bool = True) -> List[Tuple[str, float]]:
+        """Retorna os ``k`` ids mais próximos com seus scores (cosseno)."""
+        if not self.ids:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        if self.exact or not self.trained:
+            # Busca exata nos vetores em precisão total (ainda sem treino, ou sem compressão)
+            scores = self.full @ query
+            top = np.argsort(-scores)[:k]
+            return [(self.ids[i], float(scores[i])) for i in top]
+        reduced = self._reduce(query)
+
+        if self.quantizer:
+            approx = self.quantizer.scores(reduced, self.codes)
+        else:
+            approx = self.codes @ reduced
+
+        shortlist_size = min(len(self.ids), k * self.rescore_factor if rescore else k)
+        shortlist = np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]
+
+        if rescore:
+            # Índices ordenados tornam a leitura do memmap sequencial
+            shortlist = np.sort(shortlist)
+            scores = np.asarray(self.full[shortlist]) @ query
+        else:
+            scores = approx[shortlist]
+
+        order = np.argsort(-scores)[:k]
+        return [(self.ids[shortlist[i]], float(scores[i])) for i in order]
+
+    def memory_bytes(self) -> int:
+        """Bytes mantidos em RAM: códigos comprimidos e os vetores em float32 que não estão em memmap."""
+        total = 0 if self.codes is None else int(self.codes.nbytes)
+        if self.full is not None and not isinstance(self.full, np.memmap):
+            total += int(self.full.nbytes)
+        return total
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Salva o índice em um diretório (arrays .npy + config JSON).
+
+        Cada arquivo é gravado num temporário e renomeado: um índice carregado
+        em memmap do mesmo diretório continua lendo os arquivos antigos. Depois
+        de salvo no próprio diretório, ``full`` passa a ser lido do disco.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("save() requer um diretório (ou index.path)")
+        os.makedirs(path, exist_ok=True)
+        if self.path is None:
+            self.path = path
+
+        def replace(name: str, write) -> None:
+            target = os.path.join(path, name)
+            temporary = f"{target}.tmp"
+            with open(temporary, "wb") as f:
+                write(f)
+            os.replace(temporary, target)
+
+        config = {
+            "reduction": self.reduction,
+            "dimensions": self.dimensions,
+            "quantization": self.quantization,
+            "pq_subspaces": self.pq_subspaces,
+            "rescore_factor": self.rescore_factor,
+            "min_train_size": self.min_train_size,
+            "trained": self.trained
+        }
+        full_target = os.path.join(path, "full.npy")
+        if self.full is not None and len(self.full) and not self._on_disk(full_target):
+            self._write_full_file(full_target, [self.full])
+            if os.path.samefile(path, self.path):
+                self.full = np.load(full_target, mmap_mode="r")
+        if self.codes is not None:
+            replace("codes.npy", lambda f: np.save(f, self.codes))
+        elif os.path.exists(os.path.join(path, "codes.npy")):
+            os.remove(os.path.join(path, "codes.npy"))
+        state = {}
+        if self.reducer:
+            state.update({f"reducer_{k}": v for k, v in self.reducer.state().items() if v is not None})
+        if self.quantizer:
+            state.update({f"quantizer_{k}": v for k, v in self.quantizer.state().items() if v is not None})
+        replace("state.npz", lambda f: np.savez(f, **state))
+        replace("ids.json", lambda f: f.write(json.dumps(self.ids).encode("utf-8")))
+        # config.json por último: marca o índice como completo
+        replace("config.json", lambda f: f.write(json.dumps(config).encode("utf-8")))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "QuantizedVectorIndex":
+        """Carrega um índice salvo; os vetores de rescoring ficam em memmap."""
+        with open(os.path.join(path, "config.json")) as f:
+            config = json.load(f)
+        trained = config.pop("trained", False)
+        index = cls(**config)
+        index.path = path
+
+        with open(os.path.join(path, "ids.json")) as f:
+            index.ids = json.load(f)
+        index._positions = {vector_id: i for i, vector_id in enumerate(index.ids)}
+
+        if os.path.exists(os.path.join(path, "full.npy")):
+            full = np.load(os.path.join(path, "full.npy"), mmap_mode="r" if mmap else None)
+            # Linhas gravadas por um add() cujo save() não terminou não têm id
+            index.full = full[:len(index.ids)] if len(full) > len(index.ids) else full
+        if os.path.exists(os.path.join(path, "codes.npy")):
+            index.codes = np.load(os.path.join(path, "codes.npy"))
+
+        with np.load(os.path.join(path, "state.npz")) as state:
+            # Índice ainda não treinado não tem estado de PCA/quantizador
+            if index.reducer and trained:
+                index.reducer.load_state({
+                    k[len("reducer_"):]: state[k] for k in state.files if k.startswith("reducer_")
+                })
+            if index.quantizer and trained:
+                index.quantizer.load_state({
+                    k[len("quantizer_"):]: state[k] for k in state.files if k.startswith("quantizer_")
+                })
+        index.trained = trained
+        return index
+
+def load_or_create_index(path: Optional[str] = None) -> Optional[QuantizedVectorIndex]:
+    """Carrega o índice local de ``LOCAL_INDEX_PATH`` ou cria um novo a partir do ambiente.
+
+    Retorna ``None`` quando nenhum índice local está configurado. O índice é
+    carregado por processo: cada worker do uvicorn tem sua cópia, e vetores
+    adicionados por outro processo só aparecem após reiniciar. Para servir
+    buscas, construa o índice antes (``python -m knowledge_system.snapshot
+    import <dir> --target local``); enquanto estiver vazio, as buscas vão ao Pinecone.
+    """
+    path = path or os.getenv("LOCAL_INDEX_PATH")
+    if not path:
+        return None
+    if os.path.exists(os.path.join(path, "config.json")):
+        logger.info(f"Carregando índice vetorial local de {path}")
+        return QuantizedVectorIndex.load(path)
+
+    dimensions = os.getenv("LOCAL_INDEX_DIMENSIONS")
+    index = QuantizedVectorIndex(
+        reduction=os.getenv("LOCAL_INDEX_REDUCTION") or None,
+        dimensions=int(dimensions) if dimensions else None,
+        quantization=os.getenv("LOCAL_INDEX_QUANTIZATION", "int8"),
+        pq_subspaces=int(os.getenv("LOCAL_INDEX_PQ_SUBSPACES", "96")),
+        rescore_factor=int(os.getenv("LOCAL_INDEX_RESCORE_FACTOR", "4"))
+    )
+    index.path = path
+    return index
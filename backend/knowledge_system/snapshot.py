@@ -0,0 +1,424 @@
+"""Snapshots do índice vetorial: exporta e restaura vetores sem recalcular embeddings.
+
+Formato (um diretório):
+
+- ``manifest.json``: dimensão, modelo de embedding, namespace e lista de shards;
+- ``vectors-NNNNN.npy``: matriz float32 (linhas x dimensão) de cada shard, lida via mmap;
+- ``records-NNNNN.jsonl``: uma linha por vetor, na mesma ordem, com ``id``,
+  ``metadata`` (payload do índice) e ``chunk`` (texto e metadados do content store);
+- ``documents.jsonl``: metadados globais dos documentos.
+
+Uso (a partir de backend/):
+
+    python -m knowledge_system.snapshot export data/snapshot
+    python -m knowledge_system.snapshot import data/snapshot --target pinecone --concurrency 16
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import argparse
+import json
+import os
+import time
+import logging
+import httpx
+import numpy as np
+from .vector_store import JungianVectorStore
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# Versão da API REST do plano de dados usada pelo cliente pinecone 5.x
+PINECONE_API_VERSION = "2024-07"
+
+def _upsert_body(ids: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]], namespace: str) -> bytes:
+    if orjson is not None:
+        # orjson serializa as linhas float32 direto do numpy, sem listas intermediárias
+        return orjson.dumps(
+            {
+                "vectors": [
+                    {"id": vector_id, "values": vectors[row], "metadata": metadatas[row]}
+                    for row, vector_id in enumerate(ids)
+                ],
+                "namespace": namespace
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps({
+        "vectors": [
+            {"id": vector_id, "values": vectors[row].tolist(), "metadata": metadatas[row]}
+            for row, vector_id in enumerate(ids)
+        ],
+        "namespace": namespace
+    }).encode()
+
+SNAPSHOT_FORMAT = 1
+MANIFEST = "manifest.json"
+DOCUMENTS = "documents.jsonl"
+LOCAL_ADD_BLOCK = 50_000
+
+Batch = Tuple[List[str], np.ndarray, List[Dict[str, Any]], List[Optional[Dict[str, Any]]]]
+
+def _bounded_map(executor: ThreadPoolExecutor, func, items: Iterable[Any], max_pending: int) -> Iterator[Any]:
+    """Como ``executor.map``, mas mantém no máximo ``max_pending`` tarefas em andamento (ordem preservada)."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+class SnapshotWriter:
+    """Grava lotes de vetores em shards ``.npy`` + ``.jsonl`` à medida que chegam."""
+
+    def __init__(self, path: str, dimension: int, shard_size: int = 20_000):
+        self.path = path
+        self.dimension = dimension
+        self.shard_size = shard_size
+        self.shards: List[Dict[str, Any]] = []
+        self._vectors = np.empty((shard_size, dimension), dtype=np.float32)
+        self._records: List[str] = []
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def total(self) -> int:
+        return sum(shard["count"] for shard in self.shards) + len(self._records)
+
+    def add(self, ids: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]], chunks: List[Optional[Dict[str, Any]]]) -> None:
+        for row, vector_id in enumerate(ids):
+            self._vectors[len(self._records)] = vectors[row]
+            self._records.append(json.dumps(
+                {"id": vector_id, "metadata": metadatas[row], "chunk": chunks[row]},
+                ensure_ascii=False
+            ))
+            if len(self._records) == self.shard_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._records:
+            return
+        number = len(self.shards)
+        vectors_file = f"vectors-{number:05d}.npy"
+        records_file = f"records-{number:05d}.jsonl"
+        np.save(os.path.join(self.path, vectors_file), self._vectors[:len(self._records)])
+        with open(os.path.join(self.path, records_file), "w", encoding="utf-8") as f:
+            f.write("\n".join(self._records))
+            f.write("\n")
+        self.shards.append({"vectors": vectors_file, "records": records_file, "count": len(self._records)})
+        self._records = []
+
+    def close(self, **manifest: Any) -> Dict[str, Any]:
+        self._flush()
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "dimension": self.dimension,
+            "total": self.total,
+            "shards": self.shards,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **manifest
+        }
+        with open(os.path.join(self.path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Formato de snapshot não suportado: {manifest.get('format')}")
+    return manifest
+
+def iter_snapshot(path: str, batch_size: int = 100) -> Iterator[Batch]:
+    """Lê o snapshot em lotes (ids, vetores, payloads, chunks) sem carregar os shards inteiros."""
+    for shard in read_manifest(path)["shards"]:
+        vectors = np.load(os.path.join(path, shard["vectors"]), mmap_mode="r")
+        with open(os.path.join(path, shard["records"]), encoding="utf-8") as f:
+            start = 0
+            records: List[Dict[str, Any]] = []
+            for line in f:
+                records.append(json.loads(line))
+                if len(records) == batch_size:
+                    yield _batch(records, vectors, start)
+                    start += len(records)
+                    records = []
+            if records:
+                yield _batch(records, vectors, start)
+
+def _batch(records: List[Dict[str, Any]], vectors: np.ndarray, start: int) -> Batch:
+    return (
+        [record["id"] for record in records],
+        np.asarray(vectors[start:start + len(records)]),
+        [record.get("metadata") or {} for record in records],
+        [record.get("chunk") for record in records]
+    )
+
+# --- Exportação ---
+
+def _pinecone_batches(store: JungianVectorStore, namespace: str, batch_size: int, concurrency: int) -> Iterator[Batch]:
+    """Lista os ids do índice Pinecone e busca os vetores em paralelo, em lotes."""
+    def fetch(ids: List[str]) -> Batch:
+        # Resposta crua: o cliente OpenAPI validaria cada float do vetor (a maior parte do custo)
+        response = store.index.fetch(ids=ids, namespace=namespace, _preload_content=False)
+        fetched = _loads(response.data)["vectors"]
+        found = [vector_id for vector_id in ids if vector_id in fetched]
+        vectors = np.asarray([fetched[i]["values"] for i in found], dtype=np.float32).reshape(-1, store.dimension)
+        metadatas = [fetched[i].get("metadata") or {} for i in found]
+        return found, vectors, metadatas, []
+
+    def id_batches() -> Iterator[List[str]]:
+        buffer: List[str] = []
+        for page in store.index.list(namespace=namespace):
+            buffer.extend(page)
+            while len(buffer) >= batch_size:
+                yield buffer[:batch_size]
+                buffer = buffer[batch_size:]
+        if buffer:
+            yield buffer
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        yield from _bounded_map(executor, fetch, id_batches(), concurrency * 2)
+
+def _local_batches(store: JungianVectorStore, batch_size: int) -> Iterator[Batch]:
+    """Percorre o índice local; o payload é reconstruído a partir do content store."""
+    index = store.local_index
+    for start in range(0, len(index.ids), batch_size):
+        ids = index.ids[start:start + batch_size]
+        chunks = store.content_store.get_chunks(ids)
+        documents = store.content_store.get_documents(c["doc_id"] for c in chunks.values())
+        metadatas = []
+        for vector_id in ids:
+            chunk = chunks.get(vector_id) or {}
+            payload = store._compact_metadata(documents.get(chunk.get("doc_id"), {}))
+            if chunk:
+                payload.update(doc_id=chunk["doc_id"], chunk_index=chunk["chunk_index"])
+                concepts = (chunk["metadata"] or {}).get("concepts")
+                if concepts:
+                    payload["concepts"] = concepts
+                    payload.setdefault("concept", concepts[0])
+            metadatas.append(payload)
+        yield list(ids), np.asarray(index.full[start:start + batch_size], dtype=np.float32), metadatas, []
+
+def export_snapshot(
+    store: JungianVectorStore,
+    path: str,
+    namespace: str = "jungian-concepts",
+    source: str = "pinecone",
+    batch_size: int = 100,
+    concurrency: int = 8,
+    shard_size: int = 20_000
+) -> Dict[str, Any]:
+    """Exporta vetores, payloads, chunks e documentos de ``store`` para ``path``."""
+    if source == "local":
+        if store.local_index is None:
+            raise ValueError("Exportação do índice local requer LOCAL_INDEX_PATH")
+        batches = _local_batches(store, batch_size)
+    elif source == "pinecone":
+        batches = _pinecone_batches(store, namespace, batch_size, concurrency)
+    else:
+        raise ValueError(f"Origem desconhecida: {source}")
+
+    writer = SnapshotWriter(path, store.dimension, shard_size)
+    started = time.perf_counter()
+    for ids, vectors, metadatas, _ in batches:
+        chunks = store.content_store.get_chunks(ids)
+        writer.add(ids, vectors, metadatas, [chunks.get(vector_id) for vector_id in ids])
+        if writer.total % (batch_size * 100) < batch_size:
+            logger.info(f"Exportados {writer.total} vetores ({writer.total / (time.perf_counter() - started):.0f}/s)")
+
+    documents = 0
+    with open(os.path.join(path, DOCUMENTS), "w", encoding="utf-8") as f:
+        for doc_id, metadata in store.content_store.iter_documents():
+            f.write(json.dumps({"doc_id": doc_id, "metadata": metadata}, ensure_ascii=False))
+            f.write("\n")
+            documents += 1
+
+    manifest = writer.close(
+        source=source,
+        namespace=namespace,
+        index_name=store.index_name,
+        embedding_model=store.embedding_model,
+        documents=documents
+    )
+    logger.info(f"Snapshot com {manifest['total']} vetores e {documents} documentos gravado em {path}")
+    return manifest
+
+# --- Importação ---
+
+def _pinecone_rest_client(store: JungianVectorStore, concurrency: int) -> httpx.Client:
+    """Cliente HTTP para upserts direto na API REST do índice.
+
+    O cliente OpenAPI do Pinecone serializa cada float em Python puro (preso
+    ao GIL), o que anularia o paralelismo das threads de importação.
+    """
+    host = store.index.config.host
+    if not host.startswith("http"):
+        host = f"https://{host}"
+    return httpx.Client(
+        base_url=host,
+        headers={
+            "Api-Key": store.index.config.api_key,
+            "X-Pinecone-API-Version": PINECONE_API_VERSION,
+            "Content-Type": "application/json"
+        },
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+
+def import_snapshot(
+    store: JungianVectorStore,
+    path: str,
+    namespace: Optional[str] = None,
+    target: str = "pinecone",
+    batch_size: int = 100,
+    concurrency: int = 8,
+    restore_content: bool = True
+) -> int:
+    """Restaura um snapshot no Pinecone e/ou no índice local, sem chamadas de embedding.
+
+    Os upserts no Pinecone rodam em paralelo (``concurrency`` lotes de
+    ``batch_size`` vetores em andamento); o content store é restaurado junto.
+    """
+    manifest = read_manifest(path)
+    if manifest["dimension"] != store.dimension:
+        raise ValueError(
+            f"Snapshot com dimensão {manifest['dimension']}, mas o índice usa {store.dimension}"
+        )
+    if manifest.get("embedding_model") and manifest["embedding_model"] != store.embedding_model:
+        logger.warning(
+            f"Snapshot gerado com {manifest['embedding_model']}; o backend usa {store.embedding_model}"
+        )
+    namespace = namespace if namespace is not None else manifest.get("namespace", "jungian-concepts")
+    to_pinecone = target in ("pinecone", "both")
+    to_local = target in ("local", "both")
+    if target not in ("pinecone", "local", "both"):
+        raise ValueError(f"Destino desconhecido: {target}")
+    if to_local and store.local_index is None:
+        raise ValueError("Importação no índice local requer LOCAL_INDEX_PATH")
+
+    if restore_content:
+        documents: List[Tuple[str, Dict[str, Any]]] = []
+        with open(os.path.join(path, DOCUMENTS), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                documents.append((record["doc_id"], record["metadata"]))
+                if len(documents) == 1000:
+                    store.content_store.put_documents(documents)
+                    documents = []
+        store.content_store.put_documents(documents)
+
+    local_ids: List[str] = []
+    local_vectors: List[np.ndarray] = []
+
+    def flush_local() -> None:
+        # add() concatena os códigos comprimidos: blocos grandes evitam cópias quadráticas
+        if local_ids:
+            store.local_index.add(local_ids, np.concatenate(local_vectors))
+            local_ids.clear()
+            local_vectors.clear()
+
+    def prepared(batches: Iterable[Batch]) -> Iterator[Batch]:
+        # Content store e índice local são atualizados na thread principal, lote a lote
+        for batch in batches:
+            ids, vectors, metadatas, chunks = batch
+            if store.payload_text:
+                # Migra vetores antigos para instâncias sem content store compartilhado
+                for metadata, chunk in zip(metadatas, chunks):
+                    if chunk and "text" not in metadata:
+                        metadata["text"] = chunk["text"]
+            if restore_content:
+                store.content_store.put_chunks(
+                    (vector_id, chunk["doc_id"], chunk["chunk_index"], chunk["text"], chunk["metadata"])
+                    for vector_id, chunk in zip(ids, chunks) if chunk
+                )
+            if to_local:
+                local_ids.extend(ids)
+                local_vectors.append(vectors)
+                if len(local_ids) >= LOCAL_ADD_BLOCK:
+                    flush_local()
+            yield batch
+
+    started = time.perf_counter()
+    restored = 0
+    batches = prepared(iter_snapshot(path, batch_size))
+    if to_pinecone:
+        http = _pinecone_rest_client(store, concurrency)
+
+        def upsert(batch: Batch) -> int:
+            ids, vectors, metadatas, _ = batch
+            response = http.post("/vectors/upsert", content=_upsert_body(ids, vectors, metadatas, namespace))
+            response.raise_for_status()
+            return len(ids)
+
+        with http, ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for count in _bounded_map(executor, upsert, batches, concurrency * 2):
+                restored += count
+                if restored % (batch_size * 100) < batch_size:
+                    logger.info(f"Restaurados {restored} vetores ({restored / (time.perf_counter() - started):.0f}/s)")
+    else:
+        restored = sum(len(batch[0]) for batch in batches)
+
+    flush_local()
+    if to_local and os.getenv("LOCAL_INDEX_PATH"):
+        store.local_index.save(os.getenv("LOCAL_INDEX_PATH"))
+    store.invalidate_caches()
+    logger.info(f"Snapshot restaurado: {restored} vetores em {time.perf_counter() - started:.1f}s")
+    return restored
+
+def _create_store() -> JungianVectorStore:
+    from dotenv import load_dotenv
+    from .clients import UpstreamClients
+    from .quantization import load_or_create_index
+    load_dotenv()
+    return JungianVectorStore(
+        api_key=os.getenv("PINECONE_API_KEY"),
+        environment=os.getenv("PINECONE_ENVIRONMENT", "us-west-2"),
+        index_name=os.getenv("PINECONE_INDEX_NAME", "jung-knowledge"),
+        local_index=load_or_create_index(),
+        clients=UpstreamClients()
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Exporta o índice para um diretório de snapshot")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--source", choices=["pinecone", "local"], default="pinecone")
+    export_parser.add_argument("--namespace", default="jungian-concepts")
+    export_parser.add_argument("--shard-size", type=int, default=20_000)
+
+    import_parser = commands.add_parser("import", help="Restaura um snapshot no Pinecone e/ou no índice local")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--target", choices=["pinecone", "local", "both"], default="pinecone")
+    import_parser.add_argument("--namespace", default=None, help="Padrão: o namespace do snapshot")
+    import_parser.add_argument("--skip-content", action="store_true", help="Não restaura o content store")
+
+    for command in (export_parser, import_parser):
+        command.add_argument("--batch-size", type=int, default=100)
+        command.add_argument("--concurrency", type=int, default=8)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = _create_store()
+    if args.command == "export":
+        export_snapshot(
+            store, args.path, namespace=args.namespace, source=args.source,
+            batch_size=args.batch_size, concurrency=args.concurrency, shard_size=args.shard_size
+        )
+    else:
+        import_snapshot(
+            store, args.path, namespace=args.namespace, target=args.target,
+            batch_size=args.batch_size, concurrency=args.concurrency,
+            restore_content=not args.skip_content
+        )
+
+if __name__ == "__main__":
+    main()
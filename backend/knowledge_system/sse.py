@@ -0,0 +1,136 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, TypeVar
+import asyncio
+import json
+import os
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+T = TypeVar("T")
+
+class ClientDisconnected(Exception):
+    """O cliente SSE fechou a conexão antes do fim do stream."""
+
+class SSEEncoder:
+    """Serializa eventos SSE usando templates pré-montados e orjson quando disponível."""
+
+    # O único trecho dinâmico do evento de texto é a string JSON do token
+    TEXT_PREFIX = 'data: {"text": '
+    TEXT_SUFFIX = '}\n\n'
+
+    def __init__(self, use_orjson: Optional[bool] = None):
+        if use_orjson is None:
+            use_orjson = os.getenv("SSE_USE_ORJSON", "true").lower() != "false"
+        self.use_orjson = bool(use_orjson and orjson is not None)
+
+    def dumps(self, payload: Any) -> str:
+        if self.use_orjson:
+            return orjson.dumps(payload).decode()
+        return json.dumps(payload)
+
+    def text(self, text: str) -> str:
+        """Evento padrão (``message``) com um trecho da resposta."""
+        return f"{self.TEXT_PREFIX}{self.dumps(text)}{self.TEXT_SUFFIX}"
+
+    def event(self, name: str, payload: Any) -> str:
+        """Evento nomeado (``metadata``, ``error``...)."""
+        return f"event: {name}\ndata: {self.dumps(payload)}\n\n"
+
+class TokenCoalescer:
+    """Agrupa tokens do LLM em eventos SSE maiores.
+
+    O primeiro token é liberado imediatamente (preserva o time-to-first-token).
+    Depois disso, o buffer é liberado quando ``flush_interval_ms`` se passaram
+    desde o último envio ou quando acumula ``flush_bytes``. A checagem acontece
+    a cada token recebido, então um trecho pendente espera no máximo o
+    intervalo até o próximo token (ou o fim do stream, via ``flush()``).
+    Com ``flush_interval_ms=0`` cada token vira um evento, como antes.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: Optional[float] = None,
+        flush_bytes: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if flush_interval_ms is None:
+            flush_interval_ms = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "40"))
+        if flush_bytes is None:
+            flush_bytes = int(os.getenv("SSE_FLUSH_BYTES", "256"))
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_bytes = flush_bytes
+        self.clock = clock
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._last_flush: Optional[float] = None
+
+    def push(self, token: str) -> Optional[str]:
+        """Adiciona um token; retorna o texto a enviar se for hora de liberar o buffer."""
+        self._pending.append(token)
+        self._pending_size += len(token.encode("utf-8"))
+        now = self.clock()
+        if (
+            self._last_flush is None
+            or self.flush_interval <= 0
+            or now - self._last_flush >= self.flush_interval
+            or self._pending_size >= self.flush_bytes
+        ):
+            self._last_flush = now
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Libera o que estiver pendente (usado também no fim do stream)."""
+        if not self._pending:
+            return None
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        return text
+
+async def cancel_on_disconnect(
+    stream: AsyncIterator[T],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: Optional[float] = None
+) -> AsyncIterator[T]:
+    """Itera ``stream`` verificando periodicamente se o cliente desconectou.
+
+    A verificação roda a cada ``poll_interval`` segundos mesmo enquanto se
+    espera pelo próximo item (ex.: antes do primeiro token). Ao detectar a
+    desconexão, a espera em andamento é cancelada - o que aborta a requisição
+    HTTP ao upstream - o stream é fechado e ``ClientDisconnected`` é levantada.
+    """
+    if poll_interval is None:
+        poll_interval = float(os.getenv("SSE_DISCONNECT_POLL_MS", "500")) / 1000
+    loop = asyncio.get_running_loop()
+    iterator = stream.__aiter__()
+    last_check = loop.time()
+    try:
+        while True:
+            next_item = asyncio.ensure_future(iterator.__anext__())
+            try:
+                while True:
+                    timeout = max(0.0, poll_interval - (loop.time() - last_check))
+                    done, _ = await asyncio.wait({next_item}, timeout=timeout)
+                    if loop.time() - last_check >= poll_interval:
+                        last_check = loop.time()
+                        if await is_disconnected():
+                            raise ClientDisconnected()
+                    if done:
+                        break
+            except BaseException:
+                next_item.cancel()
+                await asyncio.gather(next_item, return_exceptions=True)
+                raise
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,208 @@
+from typing import List, Dict, Any, Optional, Tuple
+from contextlib import contextmanager, nullcontext
+import os
+import time
+import logging
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+from .tokenization import get_encoding
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Apenas a API do OpenTelemetry; o SDK/exportador é configurado no deploy
+    # (ex.: opentelemetry-instrument). Sem SDK, os spans são no-op.
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract as extract_trace_context
+    _tracer = trace.get_tracer("knowledge_system")
+except ImportError:
+    trace = None
+    extract_trace_context = None
+    _tracer = None
+
+# Buckets cobrindo de chamadas locais (ms) até streams longos do GPT-4 (minutos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+STAGE_LATENCY = Histogram(
+    "jung_chat_stage_seconds",
+    "Duração de cada etapa do pipeline de chat",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "jung_llm_tokens_total",
+    "Tokens enviados/recebidos do LLM (kind: prompt, completion, cached_prompt)",
+    ["kind"]
+)
+LLM_TOKENS_PER_REQUEST = Histogram(
+    "jung_llm_tokens_per_request",
+    "Tokens por requisição ao LLM",
+    ["kind"],
+    buckets=TOKEN_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    "jung_cache_requests_total",
+    "Consultas a caches, por cache e resultado (hit/miss)",
+    ["cache", "result"]
+)
+CANCELLED_STREAMS = Counter(
+    "jung_chat_cancelled_streams_total",
+    "Streams de chat interrompidos antes do fim",
+    ["reason"]
+)
+
+# Saturação dos pools de conexão: inflight / max_connections por upstream
+UPSTREAM_INFLIGHT = Gauge(
+    "jung_upstream_inflight_requests",
+    "Requisições em andamento por upstream (ocupação do pool de conexões)",
+    ["upstream"],
+    multiprocess_mode="livesum"
+)
+UPSTREAM_POOL_SIZE = Gauge(
+    "jung_upstream_pool_max_connections",
+    "Tamanho máximo do pool de conexões por upstream",
+    ["upstream"],
+    multiprocess_mode="livesum"
+)
+UPSTREAM_PINGS = Counter(
+    "jung_upstream_keepalive_pings_total",
+    "Pings de aquecimento/keep-alive enviados aos upstreams",
+    ["upstream", "result"]
+)
+WARMUP_QUERIES = Counter(
+    "jung_warmup_queries_total",
+    "Consultas populares refeitas no startup para aquecer os caches",
+    ["result"]
+)
+
+@contextmanager
+def stage(name: str, **attributes: Any):
+    """Mede uma etapa do pipeline: observa o histograma e abre um span OpenTelemetry."""
+    span = _tracer.start_as_current_span(f"chat.{name}", attributes=attributes) if _tracer else nullcontext()
+    start = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            STAGE_LATENCY.labels(stage=name).observe(time.perf_counter() - start)
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Registra uma duração medida manualmente (ex.: time-to-first-token)."""
+    STAGE_LATENCY.labels(stage=name).observe(seconds)
+
+def record_cancellation(reason: str) -> None:
+    CANCELLED_STREAMS.labels(reason=reason).inc()
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+@contextmanager
+def track_inflight(upstream: str):
+    """Conta uma requisição em andamento para o upstream enquanto o bloco executa."""
+    gauge = UPSTREAM_INFLIGHT.labels(upstream=upstream)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+def request_span(name: str, headers: Optional[Dict[str, str]] = None):
+    """Abre o span raiz de uma requisição, continuando o trace do cabeçalho ``traceparent``."""
+    if not _tracer:
+        return nullcontext()
+    context = extract_trace_context(dict(headers)) if headers else None
+    return _tracer.start_as_current_span(name, context=context)
+
+class TokenUsageCallback(AsyncCallbackHandler):
+    """Conta tokens de prompt e de resposta de uma chamada ao LLM em streaming.
+
+    As contagens começam como estimativas do tiktoken e são substituídas pelo
+    uso informado pelo provedor ao fim da chamada (``stream_usage=True`` no
+    streaming), incluindo os tokens de prompt servidos do cache de prefixo.
+    """
+
+    def __init__(self, model_name: str = "gpt-4o"):
+        self.model_name = model_name
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.reported = False
+
+    def _count(self, text: str) -> int:
+        encoding = get_encoding(self.model_name)
+        if encoding is None:
+            # Aproximação grosseira se o tiktoken não estiver disponível
+            return len(text) // 4
+        return len(encoding.encode(text))
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self.prompt_tokens += sum(
+            self._count(str(message.content)) for batch in messages for message in batch
+        )
+
+    async def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.prompt_tokens += sum(self._count(prompt) for prompt in prompts)
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self.completion_tokens += 1
+
+    @staticmethod
+    def _reported_usage(response: LLMResult) -> Optional[Tuple[int, int, int]]:
+        """(prompt, completion, prompt em cache) informados pelo provedor, se houver."""
+        # Chamadas sem streaming: o dicionário "usage" da API em llm_output
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    # Versões antigas do langchain-openai não repassam input_token_details
+                    details = usage.get("input_token_details") or {}
+                    return usage["input_tokens"], usage["output_tokens"], details.get("cache_read") or cached
+        if "prompt_tokens" in token_usage:
+            return token_usage["prompt_tokens"], token_usage.get("completion_tokens", 0), cached
+        return None
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        reported = self._reported_usage(response)
+        if reported is not None:
+            self.prompt_tokens, self.completion_tokens, self.cached_prompt_tokens = reported
+            self.reported = True
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "estimated": not self.reported,
+        }
+
+    def record(self) -> None:
+        """Exporta as contagens acumuladas para o Prometheus."""
+        for kind, value in (
+            ("prompt", self.prompt_tokens),
+            ("completion", self.completion_tokens),
+            ("cached_prompt", self.cached_prompt_tokens),
+        ):
+            LLM_TOKENS.labels(kind=kind).inc(value)
+            LLM_TOKENS_PER_REQUEST.labels(kind=kind).observe(value)
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Gera o payload de ``/metrics``, agregando workers quando PROMETHEUS_MULTIPROC_DIR está definido."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
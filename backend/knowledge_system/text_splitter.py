@@ -0,0 +1,242 @@
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from bisect import bisect_right
+from itertools import accumulate
+import os
+import re
+from .tokenization import get_encoding
+
+# Níveis da hierarquia de separadores (menor = corte preferido)
+SECTION, SUBSECTION, PARAGRAPH, LINE, SENTENCE, WORD, CHARACTER = range(7)
+
+# Uma única varredura encontra quebras de linha/parágrafo e fins de sentença;
+# títulos (## / ###) são identificados pelo texto logo após a quebra.
+_BOUNDARY = re.compile(r"\n(?:[ \t]*\n)*|(?<=[.!?])[ \t]+")
+_WORD_BOUNDARY = re.compile(r"[ \t]+")
+
+class TextSpan(NamedTuple):
+    """Trecho do texto de origem: ``text[start:end]``, com ``tokens`` tokens (aprox.)."""
+    start: int
+    end: int
+    tokens: int
+
+class JungianTextSplitter:
+    """Divide textos em chunks medidos em tokens do tiktoken, numa única passada.
+
+    O texto é segmentado uma vez nos limites de seção (``## ``), subseção
+    (``### ``), parágrafo, linha e sentença; os tokens de todos os segmentos são
+    contados em lote. Os chunks são montados gulosamente até ``chunk_size``
+    tokens, cortando no limite mais forte da hierarquia encontrado depois de
+    ``min_fill`` do chunk - o mesmo critério de prioridade dos separadores do
+    RecursiveCharacterTextSplitter, sem a recursão. Chunks são devolvidos como
+    offsets (``TextSpan``) do texto de origem; ``split_text`` fatia as strings.
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        model_name: Optional[str] = None,
+        min_fill: float = 0.5
+    ):
+        self.chunk_size = chunk_size or int(os.getenv("CHUNK_SIZE_TOKENS", "256"))
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap deve ser menor que chunk_size")
+        self.min_fill = min_fill
+        self.encoding = get_encoding(model_name or os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002"))
+        # Texto acumulado (em caracteres) antes de cada passada em split_stream
+        self.stream_window = self.chunk_size * 32
+
+    def _count_batch(self, texts: List[str]) -> List[int]:
+        if self.encoding is None:
+            # Aproximação grosseira se o tiktoken não estiver disponível
+            return [len(text) // 4 + 1 for text in texts]
+        # encode_ordinary_batch usa uma thread por item; com milhares de segmentos curtos o laço é mais rápido
+        encode = self.encoding.encode_ordinary
+        return [len(encode(text)) for text in texts]
+
+    def count_tokens(self, text: str) -> int:
+        return self._count_batch([text])[0]
+
+    def _segments(self, text: str) -> Tuple[List[int], List[int], List[int]]:
+        """Segmenta o texto; retorna (inícios, níveis do limite antes de cada segmento, tokens)."""
+        starts, levels = [0], [SECTION]
+        for match in _BOUNDARY.finditer(text):
+            position = match.end()
+            if position >= len(text):
+                break
+            if match.group().startswith("\n"):
+                if text.startswith("## ", position):
+                    level = SECTION
+                elif text.startswith("### ", position):
+                    level = SUBSECTION
+                else:
+                    level = PARAGRAPH if match.group().count("\n") > 1 else LINE
+            else:
+                level = SENTENCE
+            starts.append(position)
+            levels.append(level)
+
+        ends = starts[1:] + [len(text)]
+        tokens = self._count_batch([text[s:e] for s, e in zip(starts, ends)])
+        if max(tokens, default=0) <= self.chunk_size:
+            return starts, levels, tokens
+
+        # Segmentos maiores que um chunk (parágrafos sem pontuação) são quebrados em palavras
+        out_starts, out_levels, out_tokens = [], [], []
+        for start, end, level, count in zip(starts, ends, levels, tokens):
+            if count <= self.chunk_size:
+                out_starts.append(start)
+                out_levels.append(level)
+                out_tokens.append(count)
+                continue
+            for i, (s, e, n) in enumerate(self._split_oversized(text, start, end)):
+                out_starts.append(s)
+                out_levels.append(level if i == 0 else WORD)
+                out_tokens.append(n)
+        return out_starts, out_levels, out_tokens
+
+    def _split_oversized(self, text: str, start: int, end: int) -> List[Tuple[int, int, int]]:
+        bounds = [start] + [m.end() for m in _WORD_BOUNDARY.finditer(text, start, end) if m.end() < end]
+        word_ends = bounds[1:] + [end]
+        counts = self._count_batch([text[s:e] for s, e in zip(bounds, word_ends)])
+        pieces = []
+        for s, e, n in zip(bounds, word_ends, counts):
+            if n <= self.chunk_size:
+                pieces.append((s, e, n))
+                continue
+            # Palavra gigantesca (ex.: base64): janelas de caracteres proporcionais aos tokens
+            step = max(1, (e - s) * self.chunk_size // (n + 1))
+            for ws in range(s, e, step):
+                we = min(ws + step, e)
+                pieces.append((ws, we, n * (we - ws) // (e - s) + 1))
+        return pieces
+
+    @staticmethod
+    def _strip(text: str, start: int, end: int) -> Tuple[int, int]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def split_spans(self, text: str) -> List[TextSpan]:
+        """Divide o texto e retorna os chunks como offsets, sem copiar substrings."""
+        if not text:
+            return []
+        starts, levels, tokens = self._segments(text)
+        spans, _ = self._pack(text, starts, levels, tokens)
+        return spans
+
+    def _pack(
+        self,
+        text: str,
+        starts: List[int],
+        levels: List[int],
+        tokens: List[int],
+        first: int = 0,
+        final: Optional[int] = None
+    ) -> Tuple[List[TextSpan], int]:
+        """Monta os chunks gulosamente a partir do segmento ``first``.
+
+        Com ``final`` (usado por ``split_stream``), só os ``final`` primeiros
+        segmentos estão completos: a montagem para no primeiro chunk cujo corte
+        dependeria dos seguintes. Retorna os chunks e o segmento onde recomeçar.
+        """
+        n = len(starts)
+        cumulative = [0] + list(accumulate(tokens))
+        spans: List[TextSpan] = []
+        i = first
+        while i < n:
+            # Maior j tal que os segmentos i..j-1 cabem no chunk
+            j = max(bisect_right(cumulative, cumulative[i] + self.chunk_size, lo=i + 1) - 1, i + 1)
+            if final is not None and j >= final:
+                return spans, i
+            if j >= n:
+                cut = n
+            else:
+                # Corta no limite mais forte depois de min_fill do chunk (o mais tardio em empate)
+                min_tokens = cumulative[i] + self.min_fill * self.chunk_size
+                cut, best = j, levels[j]
+                for k in range(j - 1, i, -1):
+                    if cumulative[k] < min_tokens:
+                        break
+                    if levels[k] < best:
+                        cut, best = k, levels[k]
+
+            end = starts[cut] if cut < n else len(text)
+            start, end = self._strip(text, starts[i], end)
+            if start < end:
+                spans.append(TextSpan(start, end, cumulative[cut] - cumulative[i]))
+            if cut >= n:
+                break
+
+            # Sobreposição: recua segmentos inteiros até chunk_overlap tokens.
+            # Cortes em títulos de seção/subseção não repetem o contexto anterior.
+            next_i = cut
+            if levels[cut] > SUBSECTION:
+                floor = cumulative[cut] - self.chunk_overlap
+                while next_i - 1 > i and cumulative[next_i - 1] >= floor:
+                    next_i -= 1
+            i = next_i
+        return spans, n
+
+    @staticmethod
+    def _final_segments(text: str, starts: List[int], levels: List[int]) -> int:
+        """Quantos segmentos do início de um texto parcial já não mudam com o restante.
+
+        O último segmento original pode continuar no próximo pedaço, e o limite
+        antes dele só é definitivo se houver um caractere não branco depois
+        (a quebra ainda poderia crescer) e espaço para reconhecer ``### ``.
+        Pedaços de um parágrafo quebrado em palavras (``WORD``) acompanham o
+        parágrafo inteiro.
+        """
+        last_char = len(text.rstrip())
+        for k in range(len(starts) - 1, 0, -1):
+            if levels[k] != WORD and starts[k] < last_char and starts[k] + 4 <= len(text):
+                return k
+        return 0
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[span.start:span.end] for span in self.split_spans(text)]
+
+    def split_stream(self, stream: Iterable[str]) -> Iterator[Tuple[TextSpan, str]]:
+        """Divide um texto que chega em partes (ex.: leitura de arquivo), com memória limitada.
+
+        Produz ``(span, texto)`` com offsets relativos ao texto completo, iguais
+        aos de ``split_spans`` no texto inteiro. A cada ``stream_window``
+        caracteres novos, são emitidos os chunks que só dependem de segmentos
+        completos; o buffer recomeça no segmento onde o próximo chunk começa.
+        """
+        parts: List[str] = []
+        size = 0
+        carried = 0
+        base = 0
+        first = 0
+        for piece in stream:
+            parts.append(piece)
+            size += len(piece)
+            if size - carried < self.stream_window:
+                continue
+            buffer = "".join(parts)
+            starts, levels, tokens = self._segments(buffer)
+            final = self._final_segments(buffer, starts, levels)
+            spans, i = self._pack(buffer, starts, levels, tokens, first, final)
+            for span in spans:
+                yield TextSpan(base + span.start, base + span.end, span.tokens), buffer[span.start:span.end]
+            # Recomeça no início do segmento original: um parágrafo quebrado em
+            # palavras é segmentado de novo do mesmo jeito e retomado na palavra i
+            k = i
+            while k > 0 and levels[k] == WORD:
+                k -= 1
+            first = i - k
+            restart = starts[k]
+            parts = [buffer[restart:]]
+            size = carried = len(parts[0])
+            base += restart
+        buffer = "".join(parts)
+        if buffer:
+            starts, levels, tokens = self._segments(buffer)
+            spans, _ = self._pack(buffer, starts, levels, tokens, first)
+            for span in spans:
+                yield TextSpan(base + span.start, base + span.end, span.tokens), buffer[span.start:span.end]
@@ -0,0 +1,21 @@
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str):
+    """Encoding tiktoken do modelo (ou cl100k_base); None se o tiktoken estiver indisponível."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # O tiktoken baixa o vocabulário na primeira vez; sem rede, usamos a aproximação
+        logger.warning(f"Encoding tiktoken indisponível para {model_name}: {str(e)}")
+        return None
@@ -1,19 +1,67 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator, Sequence, Tuple
 from pinecone import Pinecone, ServerlessSpec
 from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
+from .cache import TieredCache, hash_key
+from .chunking import document_id
+from .clients import UpstreamClients
+from .content_store import JungianContentStore
+from .text_splitter import JungianTextSplitter
+from .quantization import QuantizedVectorIndex
+from .telemetry import stage, track_inflight
+import asyncio
 import os
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Campos escalares do documento que continuam no payload do vetor (filtráveis).
+# Todo o resto (texto do chunk, listas de metadados) fica no content store.
+COMPACT_METADATA_FIELDS = ("title", "category", "concept", "section_title")
+
 class JungianVectorStore:
-    def __init__(self, api_key: str, environment: str, index_name: str = "jung-knowledge"):
-        """Initialize the vector store with Pinecone."""
-        self.pc = Pinecone(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        environment: str,
+        index_name: str = "jung-knowledge",
+        content_store: Optional[JungianContentStore] = None,
+        local_index: Optional[QuantizedVectorIndex] = None,
+        cache: Optional[TieredCache] = None,
+        clients: Optional[UpstreamClients] = None
+    ):
+        """Initialize the vector store with Pinecone.
+
+        When ``local_index`` is given, vectors are also added to it (and saved
+        to its directory) and similarity searches are served from it instead
+        of Pinecone, as soon as it holds any vectors. When
+        ``cache`` is given, query embeddings and retrieval results are cached
+        (namespaces ``embeddings`` and ``retrieval``). When ``clients`` is
+        given, OpenAI and Pinecone use its shared, pre-warmed connection pools.
+        """
+        self.clients = clients
+        self.pc = clients.pinecone(api_key) if clients else Pinecone(api_key=api_key)
         self.index_name = index_name
-        self.embeddings = OpenAIEmbeddings()
+        self.content_store = content_store or JungianContentStore()
+        # Instâncias efêmeras (Cloud Run) não compartilham o content store local:
+        # VECTOR_PAYLOAD_TEXT=true grava também o texto do chunk no payload do vetor
+        self.payload_text = os.getenv("VECTOR_PAYLOAD_TEXT", "false").lower() == "true"
+        self.local_index = local_index
+        self.cache = cache
+        self.text_splitter = JungianTextSplitter()
+        self.retrieval_cache_ttl = float(os.getenv("CACHE_RETRIEVAL_TTL", "3600"))
+        # ConceptTagger opcional (depende da base de conhecimento; atribuído depois)
+        self.concept_tagger = None
+
+        # Modelos text-embedding-3 aceitam 'dimensions' (truncamento Matryoshka no provedor)
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+        embedding_dimensions = os.getenv("EMBEDDING_DIMENSIONS")
+        self.dimension = int(embedding_dimensions) if embedding_dimensions else 1536
+        embedding_kwargs = {"model": self.embedding_model}
+        if embedding_dimensions:
+            embedding_kwargs["dimensions"] = self.dimension
+        self.embeddings = clients.embeddings(**embedding_kwargs) if clients else OpenAIEmbeddings(**embedding_kwargs)
         
         # Get host from environment or use default
         self.host = os.getenv("PINECONE_INDEX_HOST", "https://jung-knowledge-vcl4wtd.svc.aped-4627-b74a.pinecone.io")
@@ -22,7 +70,7 @@ class JungianVectorStore:
         if self.index_name not in self.pc.list_indexes().names():
             self.pc.create_index(
                 name=self.index_name,
-                dimension=1536,  # OpenAI embedding dimension
+                dimension=self.dimension,  # OpenAI embedding dimension
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
@@ -30,7 +78,10 @@ class JungianVectorStore:
                 )
             )
         
-        self.index = self.pc.Index(self.index_name, host=self.host)
+        if clients:
+            self.index = clients.pinecone_index(self.pc, self.index_name, self.host)
+        else:
+            self.index = self.pc.Index(self.index_name, host=self.host)
     
     async def test_connection(self) -> bool:
         """Test the connection to Pinecone."""
@@ -41,67 +92,262 @@ class JungianVectorStore:
             raise Exception(f"Failed to connect to Pinecone: {str(e)}")
     
     def process_text(self, text: str, metadata: Dict[str, Any] = None) -> List[Document]:
-        """Process text into chunks with metadata."""
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n## ", "\n### ", "\n\n", "\n", " ", ""]
-        )
-        
-        chunks = text_splitter.split_text(text)
-        return [Document(page_content=chunk, metadata=metadata or {}) for chunk in chunks]
+        """Process text into token-sized chunks, keeping their offsets in the source text."""
+        return [
+            Document(
+                page_content=text[span.start:span.end],
+                metadata={**(metadata or {}), "start_offset": span.start, "end_offset": span.end, "token_count": span.tokens}
+            )
+            for span in self.text_splitter.split_spans(text)
+        ]
     
+    @staticmethod
+    def _compact_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Seleciona os campos escalares que podem ir no payload do vetor."""
+        return {
+            key: metadata[key]
+            for key in COMPACT_METADATA_FIELDS
+            if isinstance(metadata.get(key), (str, int, float, bool))
+        }
+
     def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]] = None) -> List[str]:
-        """Add texts to the vector store with metadata."""
+        """Add texts to the vector store with metadata.
+
+        Document metadata is stored once in the content store, chunk text is
+        stored there keyed by chunk id, and only compact fields go to Pinecone
+        (plus the chunk text when ``VECTOR_PAYLOAD_TEXT`` is enabled).
+        """
         if metadatas is None:
             metadatas = [{} for _ in texts]
         
-        documents = []
-        for text, metadata in zip(texts, metadatas):
-            documents.extend(self.process_text(text, metadata))
-        
         vectors = []
-        for i, doc in enumerate(documents):
-            embedding = self.embeddings.embed_query(doc.page_content)
-            vectors.append({
-                'id': f'jung_{i}',
-                'values': embedding,
-                'metadata': {
-                    **doc.metadata,
-                    'text': doc.page_content
+        chunk_rows = []
+        for text, metadata in zip(texts, metadatas):
+            doc_id = metadata.get("doc_id") or document_id(text)
+            self.content_store.put_document(doc_id, metadata)
+            compact = self._compact_metadata(metadata)
+
+            documents = self.process_text(text)
+            embeddings = self.embeddings.embed_documents([doc.page_content for doc in documents])
+            # Marca todos os chunks do documento com um único produto matricial
+            if self.concept_tagger is not None:
+                concept_tags = self.concept_tagger.tag(embeddings)
+            else:
+                concept_tags = [[] for _ in documents]
+
+            for i, (doc, embedding, concepts) in enumerate(zip(documents, embeddings, concept_tags)):
+                chunk_id = f"{doc_id}_{i}"
+                chunk_metadata = {**doc.metadata, "concepts": concepts}
+                chunk_rows.append((chunk_id, doc_id, i, doc.page_content, chunk_metadata))
+                payload = {
+                    **compact,
+                    'doc_id': doc_id,
+                    'chunk_index': i
                 }
-            })
+                if self.payload_text:
+                    payload['text'] = doc.page_content
+                if concepts:
+                    payload['concepts'] = concepts
+                    payload.setdefault('concept', concepts[0])
+                vectors.append({
+                    'id': chunk_id,
+                    'values': embedding,
+                    'metadata': payload
+                })
         
-        self.index.upsert(vectors=vectors)
+        self.content_store.put_chunks(chunk_rows)
+        with track_inflight("pinecone"):
+            self.index.upsert(vectors=vectors)
+        if self.local_index is not None and vectors:
+            self.local_index.add([v['id'] for v in vectors], [v['values'] for v in vectors])
+            # Sem persistir, os vetores sumiriam no restart (cada worker carrega o índice do disco)
+            if self.local_index.path:
+                self.local_index.save()
+        self.invalidate_caches()
         return [v['id'] for v in vectors]
+
+    def invalidate_caches(self) -> None:
+        """Invalida buscas e respostas em cache (em todos os workers) após mudar o índice.
+
+        Embeddings de consultas continuam válidos: dependem só do modelo.
+        """
+        if self.cache is not None:
+            self.cache.invalidate_sync("retrieval")
+            self.cache.invalidate_sync("responses")
+
+    def _hydrate_matches(self, matches: List[Dict[str, Any]]) -> List[Document]:
+        """Monta Documents a partir dos matches, buscando texto e metadados no content store."""
+        chunks = self.content_store.get_chunks(match.get('id') for match in matches)
+        doc_ids = [
+            (match.get('metadata') or {}).get('doc_id')
+            or (chunks.get(match.get('id')) or {}).get('doc_id')
+            for match in matches
+        ]
+        documents_metadata = self.content_store.get_documents(
+            doc_id for doc_id in doc_ids if doc_id
+        )
+
+        documents = []
+        missing = []
+        for match, doc_id in zip(matches, doc_ids):
+            payload = dict(match.get('metadata') or {})
+            chunk = chunks.get(match.get('id'))
+            # Vetores antigos (ou com VECTOR_PAYLOAD_TEXT) trazem o texto no payload
+            payload_text = payload.pop('text', None)
+            page_content = chunk['text'] if chunk else payload_text
+            if page_content is None:
+                missing.append(match.get('id'))
+                page_content = ''
+            metadata = {
+                **documents_metadata.get(doc_id, {}),
+                **(chunk['metadata'] if chunk else {}),
+                **payload
+            }
+            documents.append(Document(page_content=page_content, metadata=metadata))
+        if missing:
+            logger.warning(
+                f"{len(missing)} resultado(s) sem texto no content store ({self.content_store.path}) nem no payload: "
+                f"{missing[:5]}. Copie o content store para esta instância (ver snapshot) ou use VECTOR_PAYLOAD_TEXT=true."
+            )
+        return documents
     
-    def similarity_search(self, query: str, k: int = 3, namespace: str = "jungian-concepts") -> List[Document]:
+    def _embedding_cache_key(self, query: str) -> str:
+        return hash_key(self.embedding_model, self.dimension, query)
+
+    async def _embed_query_uncached(self, query: str) -> List[float]:
+        with stage("embedding"):
+            query_embedding = await self.embeddings.aembed_query(query)
+        logger.info(f"Embedding gerado para a consulta: {query[:50]}...")
+        return query_embedding
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Gera o embedding de uma consulta (via cache, quando configurado)."""
+        if self.cache is None:
+            return await self._embed_query_uncached(query)
+        return await self.cache.get_or_compute(
+            "embeddings",
+            self._embedding_cache_key(query),
+            lambda: self._embed_query_uncached(query)
+        )
+
+    async def similarity_search(self, query: str, k: int = 3, namespace: str = "jungian-concepts") -> List[Document]:
         """Realiza busca por similaridade no índice Pinecone."""
         if not self.index:
             logger.error("Índice Pinecone não inicializado.")
             raise ValueError("Índice não inicializado")
 
         try:
-            query_embedding = self.embeddings.embed_query(query)
-            logger.info(f"Embedding gerado para a consulta: {query[:50]}...")
-
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=k,
-                namespace=namespace,
-                include_metadata=True
-            )
-            logger.info(f"Busca por similaridade retornou {len(results.get('matches', []))} resultados.")
-
-            documents = []
-            if results.get('matches'):
-                for match in results['matches']:
-                    metadata = match.get('metadata', {})
-                    page_content = metadata.pop('text', '')
-                    doc = Document(page_content=page_content, metadata=metadata)
-                    documents.append(doc)
-            return documents
+            query_embedding = await self.embed_query(query)
+            return await self.similarity_search_by_vector(query_embedding, k=k, namespace=namespace)
 
         except Exception as e:
             logger.error(f"Erro durante a busca por similaridade no Pinecone: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            raise
+
+    async def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 3,
+        namespace: str = "jungian-concepts"
+    ) -> List[Document]:
+        """Busca por similaridade a partir de um embedding já calculado."""
+        if self.cache is None:
+            return await self._search_by_vector_uncached(embedding, k, namespace)
+
+        key = hash_key(
+            namespace, k, "local" if self._use_local_index() else "pinecone",
+            np.asarray(embedding, dtype=np.float32).tobytes()
+        )
+
+        async def compute():
+            documents = await self._search_by_vector_uncached(embedding, k, namespace)
+            return [{"page_content": d.page_content, "metadata": d.metadata} for d in documents]
+
+        cached = await self.cache.get_or_compute("retrieval", key, compute, ttl=self.retrieval_cache_ttl)
+        return [Document(page_content=d["page_content"], metadata=dict(d["metadata"])) for d in cached]
+
+    def _use_local_index(self) -> bool:
+        """O índice local só atende buscas depois de receber vetores; vazio, o Pinecone responde."""
+        return self.local_index is not None and len(self.local_index) > 0
+
+    async def _search_by_vector_uncached(self, embedding: List[float], k: int, namespace: str) -> List[Document]:
+        if self._use_local_index():
+            with stage("local_index_query"):
+                matches = [
+                    {'id': chunk_id, 'score': score}
+                    for chunk_id, score in self.local_index.search(embedding, k=k)
+                ]
+            logger.info(f"Busca no índice local retornou {len(matches)} resultados.")
+        else:
+            with stage("pinecone_query"), track_inflight("pinecone"):
+                # O cliente Pinecone é síncrono; roda numa thread para não bloquear o event loop
+                results = await asyncio.to_thread(
+                    self.index.query,
+                    vector=embedding,
+                    top_k=k,
+                    namespace=namespace,
+                    include_metadata=True
+                )
+            matches = results.get('matches') or []
+            logger.info(f"Busca por similaridade retornou {len(matches)} resultados.")
+
+        with stage("content_lookup"):
+            return self._hydrate_matches(matches)
+
+    async def similarity_search_many(
+        self,
+        queries: Sequence[str],
+        k: int = 3,
+        namespace: str = "jungian-concepts",
+        max_concurrency: int = 8
+    ) -> AsyncIterator[Tuple[str, List[Document], Optional[Exception]]]:
+        """Busca várias consultas: um único embed_documents e queries concorrentes limitadas.
+
+        Consultas repetidas são executadas uma vez. Os resultados são produzidos
+        à medida que cada busca termina, como tuplas (query, documentos, erro).
+        """
+        unique_queries = list(dict.fromkeys(queries))
+        if not unique_queries:
+            return
+
+        embeddings = await self._embed_queries(unique_queries)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def search(query: str, embedding: List[float]):
+            async with semaphore:
+                try:
+                    return query, await self.similarity_search_by_vector(embedding, k=k, namespace=namespace), None
+                except Exception as e:
+                    logger.error(f"Erro na busca em lote para '{query[:50]}': {str(e)}", exc_info=True)
+                    return query, [], e
+
+        tasks = [
+            asyncio.ensure_future(search(query, embedding))
+            for query, embedding in zip(unique_queries, embeddings)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings de várias consultas; só as ausentes do cache vão para a API, num único lote."""
+        embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        if self.cache is not None:
+            for i, query in enumerate(queries):
+                found, value = await self.cache.get("embeddings", self._embedding_cache_key(query))
+                if found:
+                    embeddings[i] = value
+        missing = [i for i, value in enumerate(embeddings) if value is None]
+        if missing:
+            with stage("embedding_batch"):
+                computed = await self.embeddings.aembed_documents([queries[i] for i in missing])
+            logger.info(f"Embeddings gerados em lote para {len(missing)} consultas.")
+            for i, value in zip(missing, computed):
+                embeddings[i] = value
+                if self.cache is not None:
+                    await self.cache.set("embeddings", self._embedding_cache_key(queries[i]), value)
+        return embeddings
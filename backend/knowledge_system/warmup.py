@@ -0,0 +1,289 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+from .cache import RedisCacheBackend
+from .telemetry import WARMUP_QUERIES
+
+logger = logging.getLogger(__name__)
+
+# Consultas com e-mail ou sequências longas de dígitos (telefone, documentos) nunca são gravadas
+_PERSONAL_DATA = re.compile(r"\S+@\S+|\d{4,}")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Forma canônica usada para contar frequências (caixa, acentos compostos, espaços, pontuação final)."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!.;: ")
+
+class QueryStatsStore:
+    """Frequências agregadas de consultas em SQLite (WAL), compartilhadas pelos workers do host.
+
+    Não há identificação de usuário: cada linha guarda o hash do texto
+    normalizado, o ``k`` da busca, a contagem e a data do último uso. O texto
+    de uma consulta (a forma original, usada para aquecer as mesmas chaves de
+    cache) só é gravado quando ela atinge ``min_count`` usos; consultas raras
+    nunca saem da memória do processo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_counts (
+                query_hash TEXT NOT NULL,
+                k INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                last_seen REAL NOT NULL,
+                query TEXT,
+                PRIMARY KEY (query_hash, k)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def add_counts(
+        self,
+        counts: Dict[Tuple[str, int], Tuple[str, int]],
+        min_count: int = 1,
+        retention: Optional[float] = None
+    ) -> None:
+        """Soma ``{(hash, k): (consulta, contagem)}`` numa transação e remove entradas antigas.
+
+        O texto só é gravado nas entradas cuja contagem total chegou a ``min_count``.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO query_counts (query_hash, k, count, last_seen) VALUES (?, ?, ?, ?)
+                ON CONFLICT (query_hash, k) DO UPDATE SET
+                    count = count + excluded.count,
+                    last_seen = excluded.last_seen
+                """,
+                [(query_hash, k, count, now) for (query_hash, k), (_, count) in counts.items()]
+            )
+            self._conn.executemany(
+                "UPDATE query_counts SET query = ? WHERE query_hash = ? AND k = ? AND count >= ?",
+                [(query, query_hash, k, min_count) for (query_hash, k), (query, _) in counts.items()]
+            )
+            if retention:
+                self._conn.execute("DELETE FROM query_counts WHERE last_seen < ?", (now - retention,))
+            self._conn.commit()
+
+    def top(self, n: int, min_count: int = 1) -> List[Tuple[str, int]]:
+        """As ``n`` consultas mais frequentes como (consulta, k)."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT query, k FROM query_counts
+                WHERE count >= ? AND query IS NOT NULL
+                ORDER BY count DESC, last_seen DESC LIMIT ?
+                """,
+                (min_count, n)
+            ).fetchall()
+        return [(query, k) for query, k in rows]
+
+_ADD_COUNTS_SCRIPT = """
+local min_count = tonumber(ARGV[2])
+for i = 4, #ARGV, 3 do
+    local total = tonumber(redis.call("zincrby", KEYS[1], ARGV[i + 1], ARGV[i]))
+    redis.call("zadd", KEYS[2], ARGV[1], ARGV[i])
+    if total >= min_count then
+        redis.call("hset", KEYS[3], ARGV[i], ARGV[i + 2])
+    end
+end
+if ARGV[3] ~= "" then
+    local cutoff = "(" .. ARGV[3]
+    for _, member in ipairs(redis.call("zrangebyscore", KEYS[2], "-inf", cutoff)) do
+        redis.call("zrem", KEYS[1], member)
+        redis.call("hdel", KEYS[3], member)
+    end
+    redis.call("zremrangebyscore", KEYS[2], "-inf", cutoff)
+end
+return 0
+"""
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+class RedisQueryStatsStore:
+    """Frequências agregadas de consultas no Redis do cache L2, compartilhadas entre instâncias.
+
+    Mesma interface e mesmas regras de privacidade de ``QueryStatsStore``, mas
+    as contagens sobrevivem a deploys e instâncias efêmeras (Cloud Run). Cada
+    consulta é identificada por ``<hash>:<k>`` em três chaves: contagens e
+    último uso (sorted sets) e o texto das consultas populares (hash).
+    """
+
+    def __init__(self, client: Any, prefix: str = "warmup:"):
+        self.client = client
+        self.counts_key = f"{prefix}counts"
+        self.last_seen_key = f"{prefix}last_seen"
+        self.queries_key = f"{prefix}queries"
+
+    def add_counts(
+        self,
+        counts: Dict[Tuple[str, int], Tuple[str, int]],
+        min_count: int = 1,
+        retention: Optional[float] = None
+    ) -> None:
+        """Soma as contagens atomicamente (script Lua) e remove entradas antigas."""
+        now = time.time()
+        args: List[Any] = [now, min_count, now - retention if retention else ""]
+        for (query_hash, k), (query, count) in counts.items():
+            args.extend((f"{query_hash}:{k}", count, query))
+        self.client.eval(_ADD_COUNTS_SCRIPT, 3, self.counts_key, self.last_seen_key, self.queries_key, *args)
+
+    def top(self, n: int, min_count: int = 1) -> List[Tuple[str, int]]:
+        """As ``n`` consultas mais frequentes como (consulta, k)."""
+        members = self.client.zrevrangebyscore(self.counts_key, "+inf", min_count, start=0, num=n)
+        if not members:
+            return []
+        queries = self.client.hmget(self.queries_key, members)
+        return [
+            (_text(query), int(_text(member).rsplit(":", 1)[1]))
+            for member, query in zip(members, queries) if query is not None
+        ]
+
+class QueryWarmer:
+    """Aquecimento dos caches de embeddings e buscas para as consultas populares.
+
+    - ``record``: conta consultas de ``/api/chat`` e ``/api/query`` (em memória,
+      gravadas a cada ``WARMUP_FLUSH_INTERVAL`` segundos no Redis do cache L2,
+      com ``CACHE_BACKEND=redis``, ou no SQLite em ``WARMUP_DB_PATH``);
+    - ``start``: no startup, refaz em background as ``WARMUP_TOP_N`` consultas
+      mais frequentes, que passam pelo cache do vector store.
+
+    Só as consultas em si são aquecidas: não há busca antecipada dos conceitos
+    citados nas respostas, porque nenhuma busca do chat ou de ``/api/query`` é
+    feita pelo nome de um conceito (as chaves de cache são o texto do usuário).
+
+    Para preservar a privacidade, consultas longas ou com dados pessoais são
+    ignoradas, o store guarda só hashes e contagens até a consulta ser vista
+    ``WARMUP_MIN_COUNT`` vezes (só então o texto é gravado e repetido no
+    aquecimento) e entradas sem uso há ``WARMUP_RETENTION_DAYS`` dias são apagadas.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        path: Optional[str] = None,
+        top_n: Optional[int] = None,
+        min_count: Optional[int] = None,
+        store: Optional[Any] = None
+    ):
+        self.vector_store = vector_store
+        self.store = store if store is not None else QueryStatsStore(
+            path or os.getenv("WARMUP_DB_PATH", "data/query_stats.sqlite3")
+        )
+        self.top_n = top_n if top_n is not None else int(os.getenv("WARMUP_TOP_N", "50"))
+        self.min_count = min_count if min_count is not None else int(os.getenv("WARMUP_MIN_COUNT", "3"))
+        self.concurrency = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+        self.max_query_chars = int(os.getenv("WARMUP_MAX_QUERY_CHARS", "200"))
+        self.retention = float(os.getenv("WARMUP_RETENTION_DAYS", "30")) * 86400
+        self.flush_interval = float(os.getenv("WARMUP_FLUSH_INTERVAL", "30"))
+        self._pending: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        self._pending_lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    # --- Frequências ---
+
+    def record(self, query: str, k: int = 3) -> None:
+        """Conta uma consulta (sem identificação do usuário); custo O(1) no caminho da requisição."""
+        normalized = normalize_query(query)
+        if not normalized or len(normalized) > self.max_query_chars or _PERSONAL_DATA.search(normalized):
+            return
+        key = (hashlib.sha1(normalized.encode("utf-8")).hexdigest(), k)
+        with self._pending_lock:
+            _, count = self._pending.get(key, ("", 0))
+            # Forma original (só em memória até o flush): o aquecimento precisa gerar as mesmas chaves de cache
+            self._pending[key] = (query, count + 1)
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.store.add_counts(pending, min_count=self.min_count, retention=self.retention)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.warning(f"Erro ao gravar frequências de consultas: {str(e)}")
+
+    # --- Aquecimento no startup ---
+
+    async def _warm_one(self, semaphore: asyncio.Semaphore, query: str, k: int) -> bool:
+        async with semaphore:
+            try:
+                # Mesmo caminho (e mesmas chaves de cache) de /api/query e da busca do chat
+                await self.vector_store.similarity_search(query, k=k)
+                WARMUP_QUERIES.labels(result="ok").inc()
+                return True
+            except Exception as e:
+                WARMUP_QUERIES.labels(result="error").inc()
+                logger.warning(f"Falha ao aquecer consulta popular: {str(e)}")
+                return False
+
+    async def warm_up(self, top_n: Optional[int] = None) -> int:
+        """Preenche os caches de embeddings e buscas com as consultas mais frequentes."""
+        entries = await asyncio.to_thread(self.store.top, top_n or self.top_n, self.min_count)
+        if not entries:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._warm_one(semaphore, query, k) for query, k in entries))
+        warmed = sum(results)
+        logger.info(f"Caches aquecidos com {warmed}/{len(entries)} consultas populares em {time.perf_counter() - start:.2f}s")
+        return warmed
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        # Mantém referência até o fim para a task não ser coletada
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def start(self) -> None:
+        """Agenda o aquecimento e a gravação periódica das frequências (não bloqueia o startup)."""
+        if self.vector_store.cache is None:
+            logger.info("Cache desativado; aquecimento de consultas populares ignorado")
+        elif self.top_n > 0:
+            self._spawn(self.warm_up())
+        if self.flush_interval > 0:
+            self._spawn(self._flush_loop())
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(self.flush)
+
+def create_warmer_from_env(vector_store) -> Optional[QueryWarmer]:
+    """Cria o QueryWarmer conforme WARMUP_ENABLED (padrão: ativado).
+
+    Com o cache L2 em Redis, as frequências ficam no mesmo Redis; senão, no SQLite local.
+    """
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "false":
+        return None
+    l2 = getattr(vector_store.cache, "l2", None)
+    if isinstance(l2, RedisCacheBackend):
+        return QueryWarmer(vector_store, store=RedisQueryStatsStore(l2.client))
+    return QueryWarmer(vector_store)
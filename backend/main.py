@@ -1,16 +1,21 @@
-from fastapi import FastAPI, HTTPException, Header, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Header, Depends, UploadFile, File, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional
 from knowledge_system.knowledge_base import JungianKnowledgeBase
 from knowledge_system.vector_store import JungianVectorStore
+from knowledge_system.concept_tagger import ConceptTagger
 from knowledge_system.langchain_tools import JungianAnalyst
+from knowledge_system.quantization import load_or_create_index
+from knowledge_system.cache import create_cache_from_env
+from knowledge_system.clients import UpstreamClients
+from knowledge_system.warmup import create_warmer_from_env
+from knowledge_system.telemetry import render_metrics
 import os
 import logging
 from dotenv import load_dotenv
 from datetime import datetime
 import openai
-from openai import OpenAI
 import io
 from starlette.responses import StreamingResponse
 import json
@@ -25,8 +30,9 @@ logger = logging.getLogger(__name__)
 # Carrega variáveis de ambiente
 load_dotenv()
 
-# Configuração OpenAI
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Pools de conexão compartilhados com OpenAI e Pinecone (aquecidos no startup)
+upstream_clients = UpstreamClients()
+openai_client = upstream_clients.openai()
 
 # Configuração de CORS baseada no ambiente
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
@@ -40,49 +46,13 @@ ALLOWED_ORIGINS = (
     else ["*"]
 )
 
+# Limites do endpoint de consultas em lote
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "500"))
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "8"))
+
 logger.info(f"Ambiente: {ENVIRONMENT}")
 logger.info(f"URLs permitidas: {ALLOWED_ORIGINS}")
 
-# Prompt do sistema para o analista junguiano
-SYSTEM_PROMPT = """Você é um analista junguiano experiente, com profundo conhecimento da psicologia analítica de Carl Gustav Jung.
-Seu papel é ajudar as pessoas a compreenderem melhor os conceitos junguianos e como eles se aplicam à vida cotidiana.
-
-Ao responder:
-1. Use uma linguagem clara e acessível, mas mantenha a profundidade conceitual
-2. Faça conexões entre diferentes conceitos junguianos quando relevante
-3. Ilustre com exemplos práticos e metáforas quando apropriado
-4. Cite obras e textos relevantes de Jung quando pertinente
-5. Mantenha uma postura empática e não-julgadora
-6. Evite fazer diagnósticos ou dar conselhos terapêuticos diretos
-7. Encoraje a auto-reflexão e o processo de individuação
-
-Base suas respostas no conhecimento junguiano autêntico, usando os conceitos fundamentais como:
-- Arquétipos e inconsciente coletivo
-- Processo de individuação
-- Tipos psicológicos
-- Sincronicidade
-- Complexos e sombra
-- Anima e animus
-- Self e ego
-- Símbolos e sonhos
-
-Lembre-se: seu objetivo é facilitar a compreensão e reflexão, não substituir a terapia ou análise pessoal."""
-
-# NOVO: Prompt para conversas mais simples, incorporando a persona de Jung
-SYSTEM_PROMPT_CONVERSATIONAL = """Você é Carl Gustav Jung. Responda diretamente ao seu interlocutor, mantendo sua voz e perspectiva únicas.
-Para saudações ('Olá', 'Oi', etc.) ou perguntas muito curtas e triviais, responda de forma cordial e pensativa, talvez com uma observação sucinta ou uma pergunta gentil que convide à reflexão, mas sem iniciar uma análise profunda não solicitada.
-Se a pergunta for mais substancial ou solicitar explicitamente uma exploração de conceitos, utilize seu conhecimento analítico.
-
-Considere o histórico da conversa para manter a continuidade.
-
-Histórico da conversa:
-{chat_history}
-
-Interlocutor diz: {user_input}
-
-Sua resposta (como C.G. Jung):
-"""
-
 # Inicializa o app FastAPI
 app = FastAPI(
     title="F.A.L AI Agency API",
@@ -104,20 +74,50 @@ try:
     vector_store = JungianVectorStore(
         api_key=os.getenv("PINECONE_API_KEY"),
         environment=os.getenv("PINECONE_ENVIRONMENT", "us-west-2"),
-        index_name=os.getenv("PINECONE_INDEX_NAME", "jung-knowledge")
+        index_name=os.getenv("PINECONE_INDEX_NAME", "jung-knowledge"),
+        local_index=load_or_create_index(),
+        cache=create_cache_from_env(),
+        clients=upstream_clients
     )
     knowledge_base = JungianKnowledgeBase(vector_store)
-    analyst = JungianAnalyst(knowledge_base, vector_store)
+    # Matriz local de embeddings dos conceitos, usada na ingestão e no chat. Fica vazia
+    # até a base receber conceitos/arquétipos e é atualizada a cada adição
+    vector_store.concept_tagger = ConceptTagger(knowledge_base, vector_store.embeddings)
+    vector_store.concept_tagger.build()
+    # Frequência das consultas populares, aquecidas em background no startup
+    query_warmer = create_warmer_from_env(vector_store)
+    analyst = JungianAnalyst(knowledge_base, vector_store, warmer=query_warmer)
     logger.info("Sistema de conhecimento inicializado com sucesso")
 except Exception as e:
     logger.error(f"Erro ao inicializar o sistema de conhecimento: {str(e)}")
     raise
 
+@app.on_event("startup")
+async def warm_up_upstreams():
+    """Abre as conexões com OpenAI e Pinecone antes do primeiro usuário e as mantém aquecidas.
+
+    Em seguida agenda, em background, o aquecimento dos caches com as consultas populares.
+    """
+    await upstream_clients.warm_up()
+    upstream_clients.start_keepalive()
+    if query_warmer is not None:
+        query_warmer.start()
+
+@app.on_event("shutdown")
+async def close_upstreams():
+    if query_warmer is not None:
+        await query_warmer.aclose()
+    await upstream_clients.aclose()
+
 # Classes para validação de dados
 class QueryRequest(BaseModel):
     query: str
     max_results: Optional[int] = 3
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    max_results: Optional[int] = 3
+
 class ConceptResponse(BaseModel):
     title: str
     content: str
@@ -140,13 +140,18 @@ async def root():
     return {"status": "online", "service": "F.A.L AI Agency API"}
 
 @app.post("/api/chat")
-async def chat_stream(request: ChatRequest, user_id: str = Depends(verify_auth)):
+async def chat_stream(request: ChatRequest, http_request: Request, user_id: str = Depends(verify_auth)):
     """Endpoint principal para interação com o chatbot via streaming SSE."""
     try:
         logger.info(f"Iniciando stream de chat para usuário verificado: {user_id}")
 
-        # Chama o método gerador do analyst
-        stream_generator = analyst.generate_response_stream(request.message)
+        # Chama o método gerador do analyst (propaga o traceparent para o span da requisição
+        # e cancela a geração no upstream se o cliente desconectar)
+        stream_generator = analyst.generate_response_stream(
+            request.message,
+            trace_headers=dict(http_request.headers),
+            is_disconnected=http_request.is_disconnected
+        )
 
         # Retorna a StreamingResponse
         return StreamingResponse(stream_generator, media_type="text/event-stream")
@@ -167,6 +172,8 @@ async def chat_stream(request: ChatRequest, user_id: str = Depends(verify_auth))
 async def query_knowledge_base(request: QueryRequest):
     try:
         logger.info(f"Processando consulta: {request.query}")
+        if query_warmer is not None:
+            query_warmer.record(request.query, k=request.max_results)
         results = await knowledge_base.query(
             request.query,
             max_results=request.max_results
@@ -180,6 +187,31 @@ async def query_knowledge_base(request: QueryRequest):
             detail=f"Erro ao processar consulta: {str(e)}"
         )
 
+@app.post("/api/query/batch")
+async def query_knowledge_base_batch(request: BatchQueryRequest):
+    """Processa várias consultas e devolve os resultados em NDJSON, na ordem em que ficam prontos."""
+    if len(request.queries) > QUERY_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {QUERY_BATCH_MAX_SIZE} consultas"
+        )
+    logger.info(f"Processando lote de {len(request.queries)} consultas")
+
+    async def ndjson_stream():
+        try:
+            async for item in knowledge_base.query_many(
+                request.queries,
+                max_results=request.max_results,
+                max_concurrency=QUERY_BATCH_CONCURRENCY
+            ):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # O status 200 já foi enviado; o erro vai como última linha do stream
+            logger.error(f"Erro ao processar lote de consultas: {str(e)}", exc_info=True)
+            yield json.dumps({"error": f"Erro ao processar lote de consultas: {str(e)}"}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
 @app.get("/api/health")
 async def health_check():
     """Full health check that verifies all service connections"""
@@ -199,6 +231,12 @@ async def health_check():
             detail=f"Serviço indisponível: {str(e)}"
         )
 
+@app.get("/metrics")
+async def metrics():
+    """Exporta métricas no formato Prometheus (latência por etapa, tokens, caches)."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/api/startup-check")
 async def startup_check():
     """Simple health check for container startup"""
@@ -0,0 +1,10 @@
+import asyncio
+import os
+import sys
+
+# Permite rodar ``python -m pytest`` tanto de backend/ quanto da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(coro, timeout: float = 10.0):
+    """Roda uma corrotina de teste (sem pytest-asyncio), com timeout para não travar a suíte."""
+    return asyncio.run(asyncio.wait_for(coro, timeout))
@@ -0,0 +1,205 @@
+"""Comportamento do TieredCache: single-flight, cancelamento, invalidação e L2 em SQLite."""
+import asyncio
+import time
+import numpy as np
+import pytest
+from conftest import run
+from knowledge_system.cache import (
+    LocalCache,
+    SQLiteCacheBackend,
+    TieredCache,
+    decode_value,
+    encode_value,
+)
+
+class Counter:
+    """compute() lento que conta as chamadas."""
+
+    def __init__(self, value, delay: float = 0.05):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+# --- Codificação e L1 ---
+
+def test_vectors_roundtrip_as_float32():
+    vector = [0.1, -2.5, 3.0]
+    data = encode_value(vector)
+    assert len(data) == 1 + 4 * len(vector)
+    assert np.allclose(decode_value(data), vector)
+    assert np.allclose(decode_value(encode_value(np.asarray(vector))), vector)
+
+def test_other_values_roundtrip_as_json():
+    value = [{"page_content": "sombra", "metadata": {"concepts": ["Sombra"], "chunk_index": 2}}]
+    assert decode_value(encode_value(value)) == value
+    assert decode_value(encode_value([])) == []
+    assert decode_value(encode_value("texto")) == "texto"
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(max_items=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+
+def test_local_cache_expires_entries(monkeypatch):
+    cache = LocalCache()
+    cache.set("a", 1, ttl=10)
+    later = time.monotonic() + 3600
+    monkeypatch.setattr("knowledge_system.cache.time.monotonic", lambda: later)
+    assert cache.get("a") == (False, None)
+
+# --- get_or_compute ---
+
+def test_concurrent_requests_share_one_compute():
+    async def scenario():
+        cache = TieredCache()
+        compute = Counter("valor")
+        results = await asyncio.gather(*(cache.get_or_compute("ns", "k", compute) for _ in range(10)))
+        assert results == ["valor"] * 10
+        assert compute.calls == 1
+        # Depois do cálculo, o valor vem do L1
+        assert await cache.get_or_compute("ns", "k", compute) == "valor"
+        assert compute.calls == 1
+        assert cache._inflight == {}
+    run(scenario())
+
+def test_cancelling_the_first_request_does_not_cancel_other_waiters():
+    async def scenario():
+        cache = TieredCache()
+        compute = Counter([1.0, 2.0], delay=0.1)
+        first = asyncio.create_task(cache.get_or_compute("ns", "k", compute))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.get_or_compute("ns", "k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == [1.0, 2.0]
+        assert first.cancelled()
+        assert compute.calls == 1
+        # O cálculo concluído continua em cache para as próximas requisições
+        assert await cache.get("ns", "k") == (True, [1.0, 2.0])
+    run(scenario())
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        cache = TieredCache()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream fora do ar")
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute("ns", "k", failing) for _ in range(3)),
+            return_exceptions=True
+        )
+        assert calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert cache._inflight == {}
+        assert await cache.get_or_compute("ns", "k", Counter("ok")) == "ok"
+    run(scenario())
+
+def test_invalidate_makes_old_entries_unreachable():
+    async def scenario():
+        cache = TieredCache()
+        await cache.set("retrieval", "k", "antigo")
+        await cache.set("embeddings", "k", "embedding")
+        await cache.invalidate("retrieval")
+        assert await cache.get("retrieval", "k") == (False, None)
+        assert await cache.get("embeddings", "k") == (True, "embedding")
+        assert await cache.get_or_compute("retrieval", "k", Counter("novo")) == "novo"
+    run(scenario())
+
+# --- L2 em SQLite (compartilhado entre workers) ---
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+def test_sqlite_backend_add_acts_as_lock(sqlite_path):
+    backend = SQLiteCacheBackend(sqlite_path)
+    assert backend.add("lock", b"1", ttl=30)
+    assert not backend.add("lock", b"1", ttl=30)
+    backend.delete("lock")
+    assert backend.add("lock", b"1", ttl=30)
+
+def test_sqlite_backend_ttl_and_incr(sqlite_path, monkeypatch):
+    backend = SQLiteCacheBackend(sqlite_path)
+    backend.set("k", b"v", ttl=10)
+    assert backend.get("k") == b"v"
+    assert backend.incr("versao") == 1
+    assert backend.incr("versao") == 2
+    later = time.time() + 3600
+    monkeypatch.setattr("knowledge_system.cache.time.time", lambda: later)
+    assert backend.get("k") is None
+    # Lock expirado pode ser readquirido
+    assert backend.add("k", b"novo", ttl=10)
+
+def test_workers_share_values_through_l2(sqlite_path):
+    async def scenario():
+        worker_a = TieredCache(l2=SQLiteCacheBackend(sqlite_path))
+        worker_b = TieredCache(l2=SQLiteCacheBackend(sqlite_path))
+        compute_b = Counter("nunca")
+        await worker_a.set("embeddings", "k", [0.5, 0.25])
+        assert await worker_b.get_or_compute("embeddings", "k", compute_b) == [0.5, 0.25]
+        assert compute_b.calls == 0
+    run(scenario())
+
+def test_invalidation_reaches_other_workers(sqlite_path):
+    async def scenario():
+        worker_a = TieredCache(l2=SQLiteCacheBackend(sqlite_path), version_ttl=0)
+        worker_b = TieredCache(l2=SQLiteCacheBackend(sqlite_path), version_ttl=0)
+        await worker_a.set("retrieval", "k", "antigo")
+        assert await worker_b.get("retrieval", "k") == (True, "antigo")
+        await worker_a.invalidate("retrieval")
+        assert await worker_b.get("retrieval", "k") == (False, None)
+    run(scenario())
+
+def test_l2_lock_makes_other_workers_wait_for_the_value(sqlite_path):
+    async def scenario():
+        worker_a = TieredCache(l2=SQLiteCacheBackend(sqlite_path))
+        worker_b = TieredCache(l2=SQLiteCacheBackend(sqlite_path))
+        compute_a = Counter("calculado", delay=0.2)
+        compute_b = Counter("duplicado", delay=0.2)
+        task_a = asyncio.create_task(worker_a.get_or_compute("responses", "k", compute_a))
+        await asyncio.sleep(0.05)
+        result_b = await worker_b.get_or_compute("responses", "k", compute_b)
+        assert await task_a == "calculado"
+        assert result_b == "calculado"
+        assert compute_a.calls == 1
+        assert compute_b.calls == 0
+    run(scenario())
+
+def test_sqlite_backend_delete_if_only_removes_matching_value(sqlite_path):
+    backend = SQLiteCacheBackend(sqlite_path)
+    backend.add("lock", b"token-a", ttl=30)
+    assert not backend.delete_if("lock", b"token-b")
+    assert backend.get("lock") == b"token-a"
+    assert backend.delete_if("lock", b"token-a")
+    assert backend.get("lock") is None
+
+def test_worker_that_gives_up_waiting_keeps_the_other_workers_lock(sqlite_path):
+    async def scenario():
+        backend = SQLiteCacheBackend(sqlite_path)
+        worker_a = TieredCache(l2=SQLiteCacheBackend(sqlite_path))
+        worker_b = TieredCache(l2=SQLiteCacheBackend(sqlite_path), lock_wait=0.1)
+        compute_a = Counter("calculado", delay=0.5)
+        task_a = asyncio.create_task(worker_a.get_or_compute("responses", "k", compute_a))
+        await asyncio.sleep(0.05)
+        # B desiste de esperar e calcula sozinho; o lock continua sendo de A
+        assert await worker_b.get_or_compute("responses", "k", Counter("duplicado", delay=0.01)) == "duplicado"
+        full_key = await worker_a._full_key("responses", "k")
+        assert not backend.add(f"{full_key}:lock", b"outro", ttl=30)
+        assert await task_a == "calculado"
+        # A libera o próprio lock ao terminar
+        assert backend.add(f"{full_key}:lock", b"outro", ttl=30)
+    run(scenario())
@@ -0,0 +1,41 @@
+"""JungianContentStore: texto e metadados fora do payload do vetor, remontados na busca."""
+from knowledge_system.content_store import JungianContentStore
+from knowledge_system.vector_store import JungianVectorStore
+
+def make_content_store(tmp_path):
+    store = JungianContentStore(str(tmp_path / "content.sqlite3"))
+    store.put_document("doc", {"title": "Aion", "author": "C. G. Jung", "tags": ["self"]})
+    store.put_chunks([
+        ("doc_0", "doc", 0, "O Self é a totalidade da psique.", {"concepts": ["self"]}),
+        ("doc_1", "doc", 1, "A sombra é o lado renegado.", {"concepts": ["sombra"]}),
+    ])
+    return store
+
+def test_chunks_and_documents_round_trip(tmp_path):
+    store = make_content_store(tmp_path)
+    chunks = store.get_chunks(["doc_1", "missing", "doc_1"])
+    assert chunks == {
+        "doc_1": {"doc_id": "doc", "chunk_index": 1, "text": "A sombra é o lado renegado.", "metadata": {"concepts": ["sombra"]}}
+    }
+    assert store.get_documents(["doc"])["doc"]["tags"] == ["self"]
+    assert list(store.iter_chunk_ids(batch_size=1)) == [["doc_0"], ["doc_1"]]
+
+    store.delete_document("doc")
+    assert store.get_chunks(["doc_0", "doc_1"]) == {}
+    assert list(store.iter_documents()) == []
+
+def test_hydrate_matches_merges_content_store_and_payload(tmp_path):
+    vector_store = object.__new__(JungianVectorStore)
+    vector_store.content_store = make_content_store(tmp_path)
+    documents = vector_store._hydrate_matches([
+        {"id": "doc_0", "metadata": {"doc_id": "doc", "chunk_index": 0, "concept": "self"}},
+        # Vetor antigo, sem chunk no content store: o texto vem do payload
+        {"id": "legacy", "metadata": {"text": "Texto no payload", "title": "Antigo"}},
+    ])
+    assert documents[0].page_content == "O Self é a totalidade da psique."
+    assert documents[0].metadata == {
+        "title": "Aion", "author": "C. G. Jung", "tags": ["self"],
+        "concepts": ["self"], "doc_id": "doc", "chunk_index": 0, "concept": "self"
+    }
+    assert documents[1].page_content == "Texto no payload"
+    assert documents[1].metadata == {"title": "Antigo"}
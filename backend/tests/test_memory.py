@@ -0,0 +1,59 @@
+"""RollingSummaryMemory: janela literal + resumo contínuo, limitado mesmo com falhas."""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from conftest import run
+from knowledge_system.memory import SUMMARY_PROMPT, RollingSummaryMemory
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+class FakeSummaryLLM:
+    def __init__(self, fail=False):
+        self.prompts = []
+        self.fail = fail
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("modelo indisponível")
+        return FakeResponse(f"resumo {len(self.prompts)}")
+
+def save_turns(memory, start, end):
+    for i in range(start, end):
+        memory.save_context({"input": f"pergunta {i}"}, {"output": f"resposta {i}"})
+
+def test_turns_leaving_the_window_are_summarized():
+    llm = FakeSummaryLLM()
+    memory = RollingSummaryMemory(llm, k=2)
+    save_turns(memory, 0, 4)
+    assert memory.needs_summary
+    assert [u for u, _ in memory.pending] == ["pergunta 0", "pergunta 1"]
+
+    run(memory.asummarize())
+    assert not memory.needs_summary
+    assert "pergunta 0" in llm.prompts[0] and "pergunta 2" not in llm.prompts[0]
+    messages = memory.load_memory_variables({})["chat_history"]
+    assert messages[0] == SystemMessage(content="Resumo da conversa até aqui: resumo 1")
+    assert messages[1:] == [
+        HumanMessage(content="pergunta 2"), AIMessage(content="resposta 2"),
+        HumanMessage(content="pergunta 3"), AIMessage(content="resposta 3"),
+    ]
+
+def test_pending_turns_are_bounded_when_summarization_fails():
+    llm = FakeSummaryLLM(fail=True)
+    memory = RollingSummaryMemory(llm, k=2, max_pending=3, max_turn_chars=5)
+    save_turns(memory, 0, 10)
+    with pytest.raises(RuntimeError):
+        run(memory.asummarize())
+    assert [u for u, _ in memory.pending] == ["pergunta 5", "pergunta 6", "pergunta 7"]
+    assert memory.dropped == 5
+    # Cada turno entra no prompt cortado em max_turn_chars
+    assert "pergu…" in llm.prompts[0] and "pergunta" not in llm.prompts[0].split("Novos turnos:")[1]
+    # Prompt enviado: resumo (vazio) + até k pendentes + k recentes
+    assert len(memory.load_memory_variables({})["chat_history"]) == 2 * (2 + 2)
+
+def test_summary_prompt_does_not_ask_for_personal_data():
+    # A memória é compartilhada entre conversas: o resumo não pode reter dados do interlocutor
+    assert "informações pessoais" not in SUMMARY_PROMPT
+    assert "Não registre nomes, dados pessoais" in SUMMARY_PROMPT
@@ -0,0 +1,21 @@
+"""Prompts das chains: prefixo estático compartilhado entre chains, usuários e turnos."""
+from knowledge_system.prompts import (
+    ARCHETYPE_PROMPT,
+    CONCEPT_PROMPT,
+    CONVERSATIONAL_PROMPT,
+    SYSTEM_PROMPT,
+    THERAPEUTIC_PROMPT,
+)
+
+PROMPTS = [CONCEPT_PROMPT, ARCHETYPE_PROMPT, THERAPEUTIC_PROMPT, CONVERSATIONAL_PROMPT]
+
+def test_every_chain_starts_with_the_same_static_system_message():
+    for prompt in PROMPTS:
+        system = prompt.messages[0]
+        assert system.prompt.template == SYSTEM_PROMPT
+        assert system.prompt.input_variables == []
+
+def test_shared_prefix_does_not_assume_a_persona():
+    # Cada tarefa define a própria voz; a parte comum não pode se contradizer
+    assert "Você é" not in SYSTEM_PROMPT
+    assert "Tarefa: conversa\nResponda na voz de Carl Gustav Jung" in SYSTEM_PROMPT
@@ -0,0 +1,108 @@
+"""QuantizedVectorIndex: recall contra a busca exata, persistência e vetores em disco."""
+import numpy as np
+import pytest
+from knowledge_system.quantization import QuantizedVectorIndex, _normalize
+
+DIM = 64
+K = 10
+
+def clustered_embeddings(n: int, seed: int = 0) -> np.ndarray:
+    """Embeddings com espectro decrescente, agrupados como os de um corpus real."""
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(np.arange(1, DIM + 1))
+    centers = rng.standard_normal((40, DIM)) * spectrum
+    noise = rng.standard_normal((n, DIM)) * spectrum * 0.6
+    return _normalize((centers[rng.integers(0, 40, size=n)] + noise).astype(np.float32))
+
+@pytest.fixture(scope="module")
+def corpus():
+    base = clustered_embeddings(3000)
+    rng = np.random.default_rng(1)
+    queries = _normalize(base[:50] + rng.standard_normal((50, DIM)).astype(np.float32) * 0.02)
+    ids = [str(i) for i in range(len(base))]
+    truth = np.argsort(-(queries @ base.T), axis=1)[:, :K]
+    return base, queries, ids, [{ids[i] for i in row} for row in truth]
+
+def recall(index, queries, truth, rescore=True):
+    found = [{i for i, _ in index.search(q, k=K, rescore=rescore)} for q in queries]
+    return np.mean([len(t & f) / K for t, f in zip(truth, found)])
+
+@pytest.mark.parametrize("config, minimum", [
+    (dict(quantization=None), 1.0),
+    (dict(quantization="int8"), 0.98),
+    (dict(quantization="pq", pq_subspaces=16), 0.8),
+    (dict(reduction="matryoshka", dimensions=32, quantization="int8"), 0.9),
+    (dict(reduction="pca", dimensions=32, quantization="int8"), 0.95),
+    (dict(reduction="pca", dimensions=32, quantization="pq", pq_subspaces=8), 0.7),
+])
+def test_recall_against_exact_search(corpus, config, minimum):
+    base, queries, ids, truth = corpus
+    index = QuantizedVectorIndex(min_train_size=256, **config)
+    index.add(ids, base)
+    assert index.trained
+    assert recall(index, queries, truth) >= minimum
+
+@pytest.mark.parametrize("config", [
+    dict(quantization="pq", pq_subspaces=16),
+    dict(reduction="pca", dimensions=32, quantization="int8"),
+])
+def test_save_load_round_trip(tmp_path, corpus, config):
+    base, queries, ids, _ = corpus
+    index = QuantizedVectorIndex(min_train_size=256, **config)
+    index.add(ids, base)
+    index.save(str(tmp_path))
+
+    loaded = QuantizedVectorIndex.load(str(tmp_path))
+    assert loaded.ids == index.ids
+    assert loaded.trained
+    np.testing.assert_array_equal(loaded.codes, index.codes)
+    for query in queries[:10]:
+        assert loaded.search(query, k=K, rescore=False) == index.search(query, k=K, rescore=False)
+        assert loaded.search(query, k=K) == index.search(query, k=K)
+
+def test_full_vectors_stay_on_disk(tmp_path, corpus):
+    base, _, ids, _ = corpus
+    index = QuantizedVectorIndex(quantization="int8", min_train_size=256)
+    index.path = str(tmp_path)
+    index.add(ids[:1000], base[:1000])
+    index.add(ids[1000:], base[1000:])
+
+    assert isinstance(index.full, np.memmap)
+    assert index.memory_bytes() == index.codes.nbytes == len(ids) * DIM
+    np.testing.assert_allclose(np.load(tmp_path / "full.npy"), base, atol=1e-6)
+
+def test_in_memory_index_counts_full_vectors(corpus):
+    base, _, ids, _ = corpus
+    index = QuantizedVectorIndex(quantization="int8", min_train_size=256)
+    index.add(ids, base)
+    assert index.memory_bytes() == len(ids) * DIM * (1 + 4)
+
+def test_add_replaces_existing_ids_on_disk(tmp_path, corpus):
+    base, _, ids, _ = corpus
+    index = QuantizedVectorIndex(quantization="int8", min_train_size=256)
+    index.path = str(tmp_path)
+    index.add(ids, base)
+    index.save()
+
+    index.add(["7", "new"], base[[42, 43]])
+    index.save()
+    assert len(index) == len(ids) + 1
+    assert index.search(base[42], k=2)[0][0] in {"7", "42"}
+
+    loaded = QuantizedVectorIndex.load(str(tmp_path))
+    assert len(loaded.full) == len(ids) + 1
+    np.testing.assert_allclose(loaded.full[7], base[42], atol=1e-6)
+    np.testing.assert_allclose(loaded.full[-1], base[43], atol=1e-6)
+
+def test_load_ignores_rows_without_ids(tmp_path, corpus):
+    base, _, ids, _ = corpus
+    index = QuantizedVectorIndex(quantization="int8", min_train_size=256)
+    index.path = str(tmp_path)
+    index.add(ids[:500], base[:500])
+    index.save()
+    # add() sem save(): as linhas novas já estão em full.npy, mas não em ids.json
+    index.add(ids[500:600], base[500:600])
+
+    loaded = QuantizedVectorIndex.load(str(tmp_path))
+    assert len(loaded.full) == len(loaded.ids) == 500
+    assert loaded.search(base[550], k=1)[0][0] != "550"
@@ -0,0 +1,61 @@
+"""Snapshots: exportar o índice local e importar em outro reproduz vetores, chunks e documentos."""
+import numpy as np
+from knowledge_system.content_store import JungianContentStore
+from knowledge_system.quantization import QuantizedVectorIndex, _normalize
+from knowledge_system.snapshot import export_snapshot, import_snapshot, read_manifest
+from knowledge_system.vector_store import JungianVectorStore
+
+DIM = 16
+
+def make_store(tmp_path, name):
+    """JungianVectorStore só com content store e índice local (sem Pinecone nem OpenAI)."""
+    store = object.__new__(JungianVectorStore)
+    store.index_name = "jung-knowledge"
+    store.embedding_model = "text-embedding-3-small"
+    store.dimension = DIM
+    store.payload_text = False
+    store.cache = None
+    store.content_store = JungianContentStore(str(tmp_path / f"{name}.sqlite3"))
+    store.local_index = QuantizedVectorIndex(quantization="int8", min_train_size=32)
+    store.local_index.path = str(tmp_path / f"{name}_index")
+    return store
+
+def populate(store, documents=3, chunks_per_document=40):
+    rng = np.random.default_rng(0)
+    ids, vectors = [], []
+    for d in range(documents):
+        doc_id = f"doc-{d}"
+        store.content_store.put_document(doc_id, {"title": f"Obra {d}", "author": "C. G. Jung", "year": 1920 + d})
+        chunks = []
+        for c in range(chunks_per_document):
+            chunk_id = f"{doc_id}-{c}"
+            chunks.append((chunk_id, doc_id, c, f"Trecho {c} sobre a sombra", {"concepts": ["sombra"]}))
+            ids.append(chunk_id)
+            vectors.append(rng.standard_normal(DIM))
+        store.content_store.put_chunks(chunks)
+    store.local_index.add(ids, _normalize(np.asarray(vectors, dtype=np.float32)))
+    store.local_index.save()
+    return ids
+
+def test_export_import_round_trip(tmp_path, monkeypatch):
+    source = make_store(tmp_path, "source")
+    ids = populate(source)
+    snapshot = str(tmp_path / "snapshot")
+
+    manifest = export_snapshot(source, snapshot, source="local", batch_size=7, shard_size=50)
+    assert manifest["total"] == len(ids)
+    assert manifest["documents"] == 3
+    assert len(read_manifest(snapshot)["shards"]) == 3
+
+    target = make_store(tmp_path, "target")
+    monkeypatch.setenv("LOCAL_INDEX_PATH", target.local_index.path)
+    assert import_snapshot(target, snapshot, target="local", batch_size=7) == len(ids)
+
+    restored = QuantizedVectorIndex.load(target.local_index.path)
+    assert restored.ids == source.local_index.ids
+    np.testing.assert_allclose(restored.full, source.local_index.full, atol=1e-6)
+    for query in np.asarray(source.local_index.full[:5]):
+        assert [i for i, _ in restored.search(query, k=5)] == [i for i, _ in source.local_index.search(query, k=5)]
+
+    assert target.content_store.get_chunks(ids) == source.content_store.get_chunks(ids)
+    assert dict(target.content_store.iter_documents()) == dict(source.content_store.iter_documents())
@@ -0,0 +1,72 @@
+"""cancel_on_disconnect: repasse dos itens e cancelamento do upstream quando o cliente sai."""
+import asyncio
+import pytest
+from conftest import run
+from knowledge_system.sse import ClientDisconnected, cancel_on_disconnect
+
+class Upstream:
+    """Gerador lento que registra se foi cancelado e fechado."""
+
+    def __init__(self, items, delay: float = 0.0, stall: bool = False):
+        self.items = items
+        self.delay = delay
+        self.stall = stall
+        self.cancelled = False
+        self.closed = False
+
+    async def __call__(self):
+        try:
+            for item in self.items:
+                await asyncio.sleep(self.delay)
+                yield item
+            if self.stall:
+                # Simula o upstream esperando o próximo token
+                await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.closed = True
+
+async def connected():
+    return False
+
+def test_items_pass_through_while_connected():
+    async def scenario():
+        upstream = Upstream(["a", "b", "c"], delay=0.01)
+        items = [item async for item in cancel_on_disconnect(upstream(), connected, poll_interval=0.005)]
+        assert items == ["a", "b", "c"]
+        assert upstream.closed
+    run(scenario())
+
+def test_disconnect_while_waiting_cancels_upstream():
+    async def scenario():
+        upstream = Upstream(["a"], stall=True)
+        disconnected = False
+
+        async def is_disconnected():
+            return disconnected
+
+        items = []
+        with pytest.raises(ClientDisconnected):
+            async for item in cancel_on_disconnect(upstream(), is_disconnected, poll_interval=0.01):
+                items.append(item)
+                # O cliente sai enquanto o upstream ainda espera o próximo token
+                disconnected = True
+        assert items == ["a"]
+        assert upstream.cancelled
+        assert upstream.closed
+    run(scenario())
+
+def test_disconnect_before_first_item():
+    async def scenario():
+        upstream = Upstream([], stall=True)
+
+        async def is_disconnected():
+            return True
+
+        stream = cancel_on_disconnect(upstream(), is_disconnected, poll_interval=0.01)
+        with pytest.raises(ClientDisconnected):
+            await stream.__anext__()
+        assert upstream.cancelled
+    run(scenario())
@@ -0,0 +1,64 @@
+"""JungianTextSplitter: o split em streaming produz os mesmos chunks do split em memória."""
+import random
+import pytest
+from knowledge_system.text_splitter import JungianTextSplitter
+
+WORDS = ["sombra", "anima", "animus", "Self", "ego", "individuação", "arquétipo", "símbolo", "inconsciente", "persona"]
+
+def synthetic_text(seed: int, blocks: int = 400) -> str:
+    """Texto com seções, quebras com espaços, parágrafos sem pontuação e palavras gigantes."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(blocks):
+        r = rng.random()
+        if r < 0.05:
+            out.append(f"\n## {rng.choice(WORDS).title()}\n")
+        elif r < 0.1:
+            out.append(f"\n### {rng.choice(WORDS)}\n")
+        elif r < 0.2:
+            out.append(rng.choice(["\n\n", "\n  \n\t\n", "\n", "  \n", " \t "]))
+        elif r < 0.23:
+            out.append(" " + "x" * rng.randint(50, 3000) + " ")
+        elif r < 0.33:
+            out.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 400))))
+        else:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20)))
+            out.append(sentence + rng.choice([". ", "! ", "? ", ".", "...  "]))
+    return "".join(out)
+
+def pieces(text: str, size: int):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+@pytest.mark.parametrize("piece_size", [1, 17, 1000, 65536])
+def test_stream_matches_batch(piece_size):
+    splitter = JungianTextSplitter(chunk_size=64, chunk_overlap=10)
+    splitter.stream_window = 2000
+    text = synthetic_text(seed=piece_size)
+    streamed = list(splitter.split_stream(pieces(text, piece_size)))
+    assert [span for span, _ in streamed] == splitter.split_spans(text)
+    assert all(text[span.start:span.end] == chunk for span, chunk in streamed)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_stream_matches_batch_with_small_windows(seed):
+    # Janelas pequenas forçam muitos recomeços, inclusive no meio de parágrafos quebrados em palavras
+    rng = random.Random(seed)
+    splitter = JungianTextSplitter(chunk_size=rng.choice([16, 32, 64]), chunk_overlap=rng.choice([0, 4, 10]))
+    splitter.stream_window = rng.choice([50, 200, 1000])
+    text = synthetic_text(seed, blocks=150)
+    streamed = [span for span, _ in splitter.split_stream(pieces(text, rng.choice([3, 100, 1000])))]
+    assert streamed == splitter.split_spans(text)
+
+def test_chunks_fit_and_are_stripped():
+    splitter = JungianTextSplitter(chunk_size=64, chunk_overlap=10)
+    text = synthetic_text(seed=1)
+    spans = splitter.split_spans(text)
+    assert spans
+    assert all(0 < span.tokens <= splitter.chunk_size for span in spans)
+    assert all(text[span.start:span.end] == text[span.start:span.end].strip() for span in spans)
+    assert all(a.start < b.start for a, b in zip(spans, spans[1:]))
+
+def test_empty_text():
+    splitter = JungianTextSplitter(chunk_size=64, chunk_overlap=10)
+    assert splitter.split_spans("") == []
+    assert list(splitter.split_stream([])) == []
+    assert list(splitter.split_stream(["", ""])) == []
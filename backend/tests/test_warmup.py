@@ -0,0 +1,76 @@
+"""QueryWarmer: frequências gravadas sem texto até a consulta se tornar popular."""
+import sqlite3
+from conftest import run
+from knowledge_system.cache import RedisCacheBackend, TieredCache
+from knowledge_system.warmup import (
+    QueryStatsStore,
+    QueryWarmer,
+    RedisQueryStatsStore,
+    create_warmer_from_env,
+    normalize_query,
+)
+
+class FakeVectorStore:
+    cache = object()
+
+    def __init__(self):
+        self.searches = []
+
+    async def similarity_search(self, query, k=3):
+        self.searches.append((query, k))
+        return []
+
+def make_warmer(tmp_path, min_count=3):
+    path = str(tmp_path / "query_stats.sqlite3")
+    return QueryWarmer(FakeVectorStore(), path=path, top_n=10, min_count=min_count), path
+
+def stored_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT k, count, query FROM query_counts").fetchall()
+
+def test_normalize_query():
+    assert normalize_query("  O que é a  SOMBRA? ") == "o que é a sombra"
+
+def test_rare_queries_are_stored_only_as_hash_and_count(tmp_path):
+    warmer, path = make_warmer(tmp_path)
+    warmer.record("O que é a sombra?")
+    warmer.record("o que é a   sombra")
+    warmer.flush()
+    assert stored_rows(path) == [(3, 2, None)]
+    assert warmer.store.top(10, min_count=1) == []
+
+def test_text_is_stored_once_the_query_reaches_min_count(tmp_path):
+    warmer, path = make_warmer(tmp_path)
+    for _ in range(2):
+        warmer.record("O que é a sombra?")
+        warmer.flush()
+    warmer.record("O que é a Sombra?")
+    warmer.flush()
+    assert stored_rows(path) == [(3, 3, "O que é a Sombra?")]
+    assert warmer.store.top(10, min_count=3) == [("O que é a Sombra?", 3)]
+
+def test_personal_data_and_long_queries_are_ignored(tmp_path):
+    warmer, path = make_warmer(tmp_path, min_count=1)
+    warmer.record("meu email é fulano@exemplo.com")
+    warmer.record("meu telefone é 11 98765-4321")
+    warmer.record("sombra " * 100)
+    warmer.flush()
+    assert stored_rows(path) == []
+
+def test_warm_up_replays_popular_queries(tmp_path):
+    warmer, _ = make_warmer(tmp_path, min_count=2)
+    for query in ["anima", "anima", "self", "ego", "ego", "ego"]:
+        warmer.record(query, k=5)
+    warmer.flush()
+    assert run(warmer.warm_up()) == 2
+    assert warmer.vector_store.searches == [("ego", 5), ("anima", 5)]
+
+def test_counts_go_to_the_redis_l2_when_configured(tmp_path, monkeypatch):
+    monkeypatch.setenv("WARMUP_DB_PATH", str(tmp_path / "query_stats.sqlite3"))
+    vector_store = FakeVectorStore()
+    assert isinstance(create_warmer_from_env(vector_store).store, QueryStatsStore)
+
+    client = object()
+    vector_store.cache = TieredCache(l2=RedisCacheBackend(client=client))
+    store = create_warmer_from_env(vector_store).store
+    assert isinstance(store, RedisQueryStatsStore) and store.client is client